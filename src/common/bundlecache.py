@@ -0,0 +1,91 @@
+"""Local cache of patched bundles keyed by their inputs.
+Lets unchanged imports be copied instead of redone."""
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Union
+
+from . import logger
+
+
+def key(bundle: str, tlHash: str, options: str) -> str:
+    """Return the cache key for patching the original bundle with a translation file's content and options."""
+    return hashlib.blake2b(f"{bundle}\0{tlHash}\0{options}".encode(), digest_size=20).hexdigest()
+
+
+class BundleCache:
+    """Patched bundles stored by key in cacheDir/xx/key.
+    Hits refresh the mtime, which decides what to evict once the cache grows past maxBytes."""
+
+    def __init__(self, cacheDir: Union[str, os.PathLike], maxBytes: int) -> None:
+        self.cacheDir = Path(cacheDir)
+        self.maxBytes = maxBytes
+
+    def _path(self, key: str) -> Path:
+        return self.cacheDir / key[:2] / key
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def fetch(self, key: str, dst: Union[str, os.PathLike]) -> bool:
+        """Copy the cached bundle for key to dst, returns whether there was one."""
+        src = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            # Copy, hardlinks would be truncated along with dst by in-place saves.
+            shutil.copyfile(src, dst)
+            os.utime(src)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.debug(f"Couldn't use cached bundle {key}: {e}")
+            return False
+        return True
+
+    def put(self, key: str, src: Union[str, os.PathLike]):
+        dst = self._path(key)
+        tmp = None
+        try:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            # A unique temp file, workers in the same process may cache the same key at once.
+            with tempfile.NamedTemporaryFile(dir=dst.parent, prefix=key, suffix=".tmp", delete=False) as f:
+                tmp = f.name
+                with open(src, "rb") as srcFile:
+                    shutil.copyfileobj(srcFile, f)
+            os.replace(tmp, dst)
+        except OSError as e:
+            logger.debug(f"Couldn't cache bundle {key}: {e}")
+            if tmp:
+                Path(tmp).unlink(missing_ok=True)
+
+    def trim(self) -> int:
+        """Evict least recently used entries until the cache fits its size limit.
+        Returns the number removed."""
+        entries: list[tuple[float, int, str]] = list()
+        try:
+            with os.scandir(self.cacheDir) as dirs:
+                for d in dirs:
+                    if d.is_dir():
+                        with os.scandir(d.path) as files:
+                            for f in files:
+                                st = f.stat()
+                                entries.append((st.st_mtime, st.st_size, f.path))
+        except FileNotFoundError:
+            return 0
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Bundle cache: evicted {removed} bundles, {total / 2**30:.2f} GiB left.")
+        return removed
@@ -28,6 +28,7 @@ TARGET_TYPES = SUPPORTED_TYPES[:-2]  # Classic asset types we want to read/write
 NAMES_BLACKLIST = ["<username>", "", "モノローグ", "合成音声"]  # Special-use game names, don't touch
 
 TRANSLATION_FOLDER = Path("translations")
+CACHE_FOLDER = Path("cache")  # Local, disposable data to speed up runs
 
 # Keys found by croakfang
 DB_KEY_BASE = "F170CEA4DFCEA3E1A5D8C70BD1000000"
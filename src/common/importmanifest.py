@@ -0,0 +1,111 @@
+"""Persistent record of imported translation files and the bundles written for them.
+Lets import -U tell unchanged files apart with a lookup and a stat, without loading them or their bundles."""
+import hashlib
+import os
+import sqlite3
+from threading import Lock
+from typing import Iterable, Optional, Union
+
+from . import logger
+from .constants import CACHE_FOLDER
+from .types import GameBundle
+
+DB_FILE = CACHE_FOLDER / "imports.db"
+
+_DB: Optional[sqlite3.Connection] = None
+_DB_PID = None
+_LOCK = Lock()
+
+
+def _db() -> sqlite3.Connection:
+    global _DB, _DB_PID
+    if _DB is None or _DB_PID != os.getpid():
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _DB = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None, check_same_thread=False)
+        _DB.execute("PRAGMA journal_mode = WAL;")
+        _DB.execute("PRAGMA synchronous = NORMAL;")
+        _DB.execute(
+            "CREATE TABLE IF NOT EXISTS imports (path TEXT, dst TEXT, size INTEGER, mtime INTEGER, "
+            "hash TEXT, bundle TEXT, options TEXT, outSize INTEGER, outMtime INTEGER, "
+            "PRIMARY KEY (path, dst));"
+        )
+        _DB_PID = os.getpid()
+    return _DB
+
+
+def _key(path) -> str:
+    return os.path.abspath(path)
+
+
+def contentHash(path: Union[str, os.PathLike]) -> str:
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def put(
+    path: Union[str, os.PathLike], dst: Union[str, os.PathLike], bundle: str, options: str, tlHash: str = None
+):
+    """Record that path was imported into bundle in dst, with the given patch options.
+    Without tlHash, a later mtime change of path counts as a content change."""
+    key, dstKey = _key(path), _key(dst)
+    try:
+        st = os.stat(key)
+        outSt = os.stat(GameBundle.createPath(dstKey, bundle))
+        row = (
+            key, dstKey, st.st_size, st.st_mtime_ns, tlHash, bundle, options, outSt.st_size, outSt.st_mtime_ns
+        )
+        with _LOCK:
+            _db().execute("INSERT OR REPLACE INTO imports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);", row)
+    except (OSError, sqlite3.Error) as e:
+        logger.debug(f"Couldn't record import of {key}: {e}")
+
+
+def unchanged(files: Iterable, dst: Union[str, os.PathLike], options: str) -> set:
+    """Return the files whose content and options are the same as at their last import into dst,
+    with the written bundle untouched since."""
+    dstKey = _key(dst)
+    try:
+        with _LOCK:
+            rows = {
+                row[0]: row[1:]
+                for row in _db().execute(
+                    "SELECT path, size, mtime, hash, bundle, options, outSize, outMtime "
+                    "FROM imports WHERE dst = ?;",
+                    (dstKey,),
+                )
+            }
+    except sqlite3.Error as e:
+        logger.debug(f"Import manifest unavailable: {e}")
+        return set()
+
+    found = set()
+    touched = list()
+    for file in files:
+        key = _key(file)
+        row = rows.get(key)
+        if row is None:
+            continue
+        size, mtime, hash, bundle, rowOptions, outSize, outMtime = row
+        if rowOptions != options:
+            continue
+        try:
+            st = os.stat(key)
+            outSt = os.stat(GameBundle.createPath(dstKey, bundle))
+        except OSError:
+            continue
+        if outSt.st_size != outSize or outSt.st_mtime_ns != outMtime or st.st_size != size:
+            continue
+        if st.st_mtime_ns != mtime:
+            # Checkouts touch files without changing them, compare the content.
+            if hash is None or contentHash(key) != hash:
+                continue
+            touched.append((st.st_mtime_ns, key, dstKey))
+        found.add(file)
+
+    if touched:
+        try:
+            with _LOCK:
+                _db().executemany("UPDATE imports SET mtime = ? WHERE path = ? AND dst = ?;", touched)
+        except sqlite3.Error as e:
+            logger.debug(f"Couldn't update import manifest: {e}")
+    return found
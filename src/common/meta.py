@@ -0,0 +1,226 @@
+"""In-memory index of the game's meta DB, loaded once per run and shared by all tools."""
+import fnmatch
+import os
+import re
+import sqlite3
+from bisect import bisect_left
+from functools import cached_property
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, NamedTuple, Optional, Union
+
+from . import constants as const, logger
+from .types import StoryId
+
+
+class MetaEntry(NamedTuple):
+    hash: str  # h, the bundle's filename
+    path: str  # n, the unity path
+    type: str  # m, the manifest type
+    key: int  # e, the bundle's encryption key
+    state: int  # s
+    storyId: Optional[StoryId]
+
+
+# Unity paths of text assets, as (text type, path prefix, full pattern).
+# The StoryId parts are taken from the path the same way StoryId.parseFromPath does.
+TEXT_ASSET_PATHS = (
+    ("story", "story/data/", re.compile(r"story/data/[^/]{2}/[^/]{4}/storytimeline.*")),
+    ("ruby", "story/data/", re.compile(r"story/data/[^/]{2}/[^/]{4}/ast_ruby_.{9}")),
+    ("home", "home/data/", re.compile(r"home/data/[^/]{5}/[^/]{2}/hometimeline_.{16}")),
+    ("race", "race/storyrace/text/", re.compile(r"race/storyrace/text/storyrace_.{9}")),
+    ("lyrics", "live/musicscores/", re.compile(r"live/musicscores/m[^/]{4}/m[^/]{4}_lyrics")),
+    (
+        "preview",
+        "outgame/announceevent/",
+        re.compile(r"outgame/announceevent/loguiasset/ast_announce_event_log_ui_asset_0.{4}"),
+    ),
+)
+
+
+def parseStoryId(path: str) -> Optional[StoryId]:
+    for textType, prefix, pattern in TEXT_ASSET_PATHS:
+        if path.startswith(prefix) and pattern.fullmatch(path):
+            return StoryId.parseFromPath(textType, path)
+    return None
+
+
+def likeToRegex(pattern: str, escape: str = None) -> str:
+    """Translate an SQL LIKE pattern to an equivalent regex."""
+    out = list()
+    chars = iter(pattern)
+    for c in chars:
+        if c == escape:
+            out.append(re.escape(next(chars, "")))
+        elif c == "%":
+            out.append(".*")
+        elif c == "_":
+            out.append(".")
+        else:
+            out.append(re.escape(c))
+    return "".join(out)
+
+
+class MetaCatalog:
+    """All bundles from the meta DB's a table, with lookups by hash, StoryId and path pattern.
+    Use MetaCatalog.get() to share one instance per meta file."""
+
+    _instances: dict[Path, "MetaCatalog"] = dict()
+    _lock = Lock()
+    snapshotFile = const.CACHE_FOLDER / "meta.db"
+
+    def __init__(self, metaFile: Union[str, Path] = None, rows: Iterable[tuple] = None) -> None:
+        self.metaFile = Path(metaFile or const.GAME_META_FILE)
+        self.cacheHit = False
+        self.entries: list[MetaEntry]
+        if rows is not None:
+            self.entries = [MetaEntry(h, n, m, e, s, parseStoryId(n)) for h, n, m, e, s in rows]
+        elif (entries := self._readSnapshot()) is not None:
+            self.entries = entries
+            self.cacheHit = True
+        else:
+            self.entries = [MetaEntry(h, n, m, e, s, parseStoryId(n)) for h, n, m, e, s in self._read()]
+            self._writeSnapshot()
+
+    @cached_property
+    def byHash(self) -> dict[str, MetaEntry]:
+        return {entry.hash: entry for entry in self.entries}
+
+    @cached_property
+    def byPath(self) -> list[MetaEntry]:
+        return sorted(self.entries, key=lambda e: e.path)
+
+    @cached_property
+    def _paths(self) -> list[str]:
+        return [e.path for e in self.byPath]
+
+    @cached_property
+    def _byStoryId(self) -> dict[tuple, list[MetaEntry]]:
+        """StoryId key prefixes, (type,) to (type, set, group, id, idx), to entries"""
+        index = dict()
+        for entry in self.entries:
+            if entry.storyId is None:
+                continue
+            key = entry.storyId.asTuple()
+            for n in range(1, len(key) + 1):
+                index.setdefault(key[:n], list()).append(entry)
+        return index
+
+    def _read(self) -> list[tuple]:
+        import apsw
+
+        db = apsw.Connection(
+            f"file:{str(self.metaFile)}?hexkey={const.DB_KEY}",
+            apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY,
+        )
+        try:
+            return db.execute("SELECT h, n, m, e, s FROM a;").fetchall()
+        finally:
+            db.close()
+
+    def _fingerprint(self) -> tuple[str, int, int]:
+        st = os.stat(self.metaFile)
+        return str(self.metaFile.resolve()), st.st_size, st.st_mtime_ns
+
+    def _readSnapshot(self) -> Optional[list[MetaEntry]]:
+        """Load entries from the decrypted snapshot if it was made from the current meta file."""
+        if not self.snapshotFile.exists():
+            return None
+        try:
+            fingerprint = self._fingerprint()
+            db = sqlite3.connect(f"file:{self.snapshotFile}?mode=ro", uri=True)
+            try:
+                if db.execute("SELECT path, size, mtime FROM source;").fetchone() != fingerprint:
+                    return None
+                rows = db.execute("SELECT h, n, m, e, s, type, [set], [group], id, idx FROM a;").fetchall()
+            finally:
+                db.close()
+        except (OSError, sqlite3.Error) as e:
+            logger.debug(f"Couldn't read meta snapshot: {e}")
+            return None
+        return [MetaEntry(*row[:5], StoryId(*row[5:]) if row[5] else None) for row in rows]
+
+    def _writeSnapshot(self):
+        tmpFile = self.snapshotFile.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            fingerprint = self._fingerprint()
+            self.snapshotFile.parent.mkdir(parents=True, exist_ok=True)
+            tmpFile.unlink(missing_ok=True)
+            db = sqlite3.connect(tmpFile)
+            try:
+                db.execute("CREATE TABLE source (path TEXT, size INTEGER, mtime INTEGER);")
+                db.execute("INSERT INTO source VALUES (?, ?, ?);", fingerprint)
+                db.execute(
+                    "CREATE TABLE a (h TEXT, n TEXT, m TEXT, e INTEGER, s INTEGER, "
+                    "type TEXT, [set] TEXT, [group] TEXT, id TEXT, idx TEXT);"
+                )
+                db.executemany(
+                    "INSERT INTO a VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                    (e[:5] + (e.storyId.asTuple() if e.storyId else (None,) * 5) for e in self.entries),
+                )
+                db.commit()
+            finally:
+                db.close()
+            os.replace(tmpFile, self.snapshotFile)
+        except (OSError, sqlite3.Error) as e:
+            logger.debug(f"Couldn't write meta snapshot: {e}")
+
+    @classmethod
+    def summary(cls) -> str:
+        """Describe where the loaded catalogs came from, for run summaries."""
+        sources = ", ".join(
+            "snapshot cache hit" if c.cacheHit else "read from meta, snapshot rebuilt"
+            for c in cls._instances.values()
+        )
+        return f"Meta catalog: {sources or 'not loaded'}"
+
+    @classmethod
+    def get(cls, metaFile: Union[str, Path] = None) -> "MetaCatalog":
+        metaFile = Path(metaFile or const.GAME_META_FILE)
+        with cls._lock:
+            catalog = cls._instances.get(metaFile)
+            if catalog is None:
+                catalog = cls._instances[metaFile] = cls(metaFile)
+                logger.debug(f"Loaded {len(catalog.entries)} meta entries from {metaFile}")
+        return catalog
+
+    def find(self, hash: str) -> Optional[MetaEntry]:
+        return self.byHash.get(hash)
+
+    def stories(self, storyId: StoryId) -> list[MetaEntry]:
+        """Return text asset entries matching storyId, where unset (None) parts match anything."""
+        key = storyId.asTuple()
+        n = len(key)
+        while n > 1 and key[n - 1] is None:
+            n -= 1
+        if (found := self._byStoryId.get(key[:n])) is not None:
+            return list(found)
+        # Unset parts before set ones, check each entry of the type.
+        return [
+            e
+            for e in self._byStoryId.get(key[:1], ())
+            if all(q is None or q == v for q, v in zip(key, e.storyId.asTuple()))
+        ]
+
+    def _search(self, prefix: str, regex: re.Pattern) -> list[MetaEntry]:
+        start = bisect_left(self._paths, prefix)
+        found = list()
+        for i in range(start, len(self._paths)):
+            path = self._paths[i]
+            if not path.startswith(prefix):
+                break
+            if regex.fullmatch(path):
+                found.append(self.byPath[i])
+        return found
+
+    def glob(self, pattern: str) -> list[MetaEntry]:
+        """Return entries whose path matches a shell-style pattern, ordered by path."""
+        prefix = re.split(r"[*?\[]", pattern, 1)[0]
+        return self._search(prefix, re.compile(fnmatch.translate(pattern)))
+
+    def like(self, pattern: str, escape: str = None) -> list[MetaEntry]:
+        """Return entries whose path matches an SQL LIKE pattern, ordered by path.
+        Unlike SQLite this is case-sensitive, which makes no difference for the all-lowercase unity paths."""
+        regex = likeToRegex(pattern, escape)
+        prefix = re.split(r"[%_]" if not escape else rf"[%_{re.escape(escape)}]", pattern, 1)[0]
+        return self._search(prefix, re.compile(regex, re.DOTALL))
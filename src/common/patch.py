@@ -4,45 +4,96 @@ import os
 import sys
 from datetime import datetime, timezone
 from pathlib import Path, PurePath
-from typing import Union
+from typing import Generator, Optional, Union
 from functools import cache
 
-import regex
-
-from . import utils, logger
+from . import tlindex, utils, logger
 from .constants import GAME_ASSET_ROOT, TARGET_TYPES, TRANSLATION_FOLDER, GAME_META_FILE, set_meta
 from .types import StoryId
 
 
-def find_git_changed_files(changeType, minStoryId:tuple, jsonOnly=True):
-    from subprocess import PIPE, run
+CHANGED_SINCE_IMPORT = "last"
+
+
+def _readNulSeparated(stream) -> Generator[str, None, None]:
+    rest = b""
+    for chunk in iter(lambda: stream.read(1 << 16), b""):
+        *entries, rest = (rest + chunk).split(b"\0")
+        for entry in entries:
+            yield entry.decode()
+    if rest:
+        yield rest.decode()
+
+
+def _gitChangedPaths(cmd: list[str], porcelain: bool) -> Generator[str, None, None]:
+    """Stream added/modified paths from a -z git status/diff command."""
+    from subprocess import DEVNULL, PIPE, Popen
+
+    with Popen(cmd, stdout=PIPE, stderr=DEVNULL) as proc:
+        entries = _readNulSeparated(proc.stdout)
+        for entry in entries:
+            if porcelain:
+                # XY path, with the original path following renames/copies.
+                status, path = entry[:2], entry[3:]
+                if status[0] in "RC":
+                    next(entries, None)
+            else:
+                status, path = entry, next(entries, "")
+            if "A" in status or "M" in status:
+                yield path
+
+
+def gitHead() -> Optional[str]:
+    from subprocess import DEVNULL, PIPE, run
+
+    try:
+        res = run(["git", "rev-parse", "HEAD"], stdout=PIPE, stderr=DEVNULL)
+    except OSError:
+        return None
+    return res.stdout.decode().strip() or None
 
+
+def _importKey(dst: Union[str, PurePath, None]) -> str:
+    dst = dst or GAME_ASSET_ROOT
+    return str(Path(dst).resolve()) if dst else ""
+
+
+def setLastImport(targetType: str, dst: Union[str, PurePath], commit: str):
+    """Record the commit a type was last fully imported into dst from, for --changed last."""
+    cfg = UmaTlConfig()
+    cfg.core.setdefault("lastImport", dict()).setdefault(_importKey(dst), dict())[targetType] = commit
+    cfg.save()
+
+
+def getLastImport(targetType: str, dst: Union[str, PurePath, None]) -> Optional[str]:
+    return UmaTlConfig().core.get("lastImport", {}).get(_importKey(dst), {}).get(targetType)
+
+
+def find_git_changed_files(changeType, minStoryId:tuple, jsonOnly=True, dst=None) -> Optional[list[Path]]:
+    """Return translation files added or modified in the working tree (changeType True), in a commit,
+    or since the last import into dst, the game dir by default (CHANGED_SINCE_IMPORT).
+    None if no import has been recorded for the type."""
     found: list[Path] = list()
     targetType, targetGroup, targetId = minStoryId
-    cmd = (
-        ["git", "status", "--short", "--porcelain"]
-        if changeType is True
-        else ["git", "show", "--pretty=", "--name-status", "--diff-merges=1", changeType]
-    )
-    # Assumes git-config quotedPath = true (default) but works either way it seems.
-    for line in (
-        run(cmd, stdout=PIPE)
-        .stdout.decode("unicode-escape")
-        .encode("latin-1")
-        .decode()
-        .splitlines()
-    ):
-        m = regex.match(r'.?[AM]\s*"?([^"]+)"?', line)
-        # Ignore other statuses like "new/??"
-        if not m:
-            continue
-        path = Path(m[1])
-        group_idx = 3 if targetType in ("home") else 2
-        id_idx = 4 if targetType in ("home") else 3
+    pathspec = (TRANSLATION_FOLDER / targetType).as_posix()
+    if changeType is True:
+        cmd = ["git", "status", "--porcelain", "-z", "--", pathspec]
+    elif changeType == CHANGED_SINCE_IMPORT:
+        since = getLastImport(targetType, dst)
+        if not since:
+            return None
+        cmd = ["git", "diff", "--name-status", "-z", "--diff-filter=AM", since, "--", pathspec]
+    else:
+        cmd = [
+            "git", "show", "--pretty=", "--name-status", "-z", "--diff-merges=1", "--diff-filter=AM",
+            changeType, "--", pathspec,
+        ]
+    group_idx = 3 if targetType in ("home") else 2
+    id_idx = 4 if targetType in ("home") else 3
+    for path in _gitChangedPaths(cmd, porcelain=changeType is True):
+        path = Path(path)
         if (
-            path.parts[0] != "translations"
-            or path.parts[1] != targetType
-            or (jsonOnly and not utils.isJson(path.name))
+            (jsonOnly and not utils.isJson(path.name))
             or targetGroup and path.parts[group_idx] != targetGroup
             or targetId and path.parts[id_idx] != targetId
         ):
@@ -58,9 +109,15 @@ def searchFiles(
     targetSet=None,
     changed=False,
     jsonOnly=True,
+    dst=None,
 ) -> list[Path]:
     if changed:
-        return find_git_changed_files(changed, (targetType, targetGroup, targetId), jsonOnly)
+        found = find_git_changed_files(changed, (targetType, targetGroup, targetId), jsonOnly, dst)
+        if found is not None:
+            return found
+        logger.info(f"No import of {targetType} recorded, using all files.")
+    if jsonOnly and not isinstance(targetType, PurePath):
+        return [Path(p) for p in tlindex.search(targetType, targetGroup, targetId, targetIdx, targetSet)]
     found: list[Path] = list()
     searchDir = (
         targetType
@@ -159,7 +216,9 @@ class Args(argparse.ArgumentParser):
                 nargs="?",
                 default=False,
                 const=True,
-                help="Limit to changed files (requires git)",
+                help="Limit to changed files (requires git).\n"
+                "Uncommitted changes by default, or those in the given commit,\n"
+                f"or '{CHANGED_SINCE_IMPORT}' for changes since the last full import into -dst",
             )
             self.add_argument("-src", type=Path, default=GAME_ASSET_ROOT)
             self.add_argument("-dst", type=Path, default=Path("dat/").resolve())
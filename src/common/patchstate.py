@@ -0,0 +1,153 @@
+"""Persistent cache of bundle patch states, keyed by path and validated by size + mtime.
+Saves opening every bundle to read its edit mark when checking thousands of them."""
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Optional, Union
+
+from . import logger
+from .constants import CACHE_FOLDER
+
+DB_FILE = CACHE_FOLDER / "patchstate.db"
+EDIT_MARK = b"\x08\x04"
+
+_DB: Optional[sqlite3.Connection] = None
+_DB_PID = None
+_LOCK = Lock()
+# Filled by scan(), checked before the DB.
+_MEM: dict[str, tuple[int, int, bool, Optional[int]]] = dict()
+
+PatchState = tuple[bool, Optional[int]]
+
+
+def _db() -> sqlite3.Connection:
+    global _DB, _DB_PID
+    # Connections can't be shared with forked processes.
+    if _DB is None or _DB_PID != os.getpid():
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _DB = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None, check_same_thread=False)
+        _DB.execute("PRAGMA journal_mode = WAL;")
+        _DB.execute("PRAGMA synchronous = NORMAL;")
+        _DB.execute(
+            "CREATE TABLE IF NOT EXISTS state "
+            "(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, patched INTEGER, modified INTEGER);"
+        )
+        _DB_PID = os.getpid()
+    return _DB
+
+
+def parseTail(tail: bytes) -> PatchState:
+    """Return (isPatched, patch timestamp) from the last 7 bytes of a bundle."""
+    if len(tail) == 7 and tail[5:] == EDIT_MARK:
+        return True, int.from_bytes(tail[:5], byteorder="big")
+    return False, None
+
+
+def readTail(path: Union[str, os.PathLike]) -> PatchState:
+    try:
+        with open(path, "rb") as f:
+            f.seek(-7, os.SEEK_END)
+            return parseTail(f.read(7))
+    except OSError:
+        return False, None
+
+
+def _key(path) -> str:
+    return os.path.abspath(path)
+
+
+def get(path: Union[str, os.PathLike], st: os.stat_result) -> Optional[PatchState]:
+    """Return the cached state of path if the file is unchanged since it was stored, else None."""
+    key = _key(path)
+    entry = _MEM.get(key)
+    if entry is None:
+        try:
+            with _LOCK:
+                entry = _db().execute(
+                    "SELECT size, mtime, patched, modified FROM state WHERE path = ?;", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Patch state cache unavailable: {e}")
+            return None
+        if entry is None:
+            return None
+    size, mtime, patched, modified = entry
+    if size != st.st_size or mtime != st.st_mtime_ns:
+        return None
+    return bool(patched), modified
+
+
+def put(path: Union[str, os.PathLike], state: PatchState, st: os.stat_result = None):
+    key = _key(path)
+    try:
+        st = st or os.stat(key)
+        entry = (st.st_size, st.st_mtime_ns, *state)
+        with _LOCK:
+            _db().execute("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?);", (key, *entry))
+    except (OSError, sqlite3.Error) as e:
+        logger.debug(f"Couldn't cache patch state of {key}: {e}")
+        return
+    if key in _MEM:
+        _MEM[key] = entry
+
+
+def read(path: Union[str, os.PathLike]) -> PatchState:
+    """Return the patch state of a bundle, from cache when possible."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False, None
+    state = get(path, st)
+    if state is None:
+        state = readTail(path)
+        put(path, state, st)
+    return state
+
+
+def scan(root: Union[str, os.PathLike], workers=8) -> int:
+    """Bring the cache up to date for all bundles in a dat dir (root/xx/hash), reading changed files
+    concurrently. Results are also kept in memory for this process. Returns the number of bundles read."""
+    entries: list[os.DirEntry] = list()
+    try:
+        with os.scandir(root) as dirs:
+            for d in dirs:
+                if d.is_dir():
+                    with os.scandir(d.path) as files:
+                        entries.extend(f for f in files if f.is_file())
+    except OSError:
+        return 0
+
+    try:
+        with _LOCK:
+            cached = {row[0]: row[1:] for row in _db().execute("SELECT * FROM state;")}
+    except sqlite3.Error as e:
+        logger.debug(f"Patch state cache unavailable: {e}")
+        return 0
+
+    stale: list[tuple[str, os.stat_result]] = list()
+    for entry in entries:
+        key = _key(entry.path)
+        st = entry.stat()
+        old = cached.get(key)
+        if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+            _MEM[key] = old
+        else:
+            stale.append((key, st))
+
+    if stale:
+        with ThreadPoolExecutor(workers) as pool:
+            states = list(pool.map(readTail, (key for key, _ in stale)))
+        rows = [(key, st.st_size, st.st_mtime_ns, *state) for (key, st), state in zip(stale, states)]
+        for row in rows:
+            _MEM[row[0]] = row[1:]
+        try:
+            with _LOCK:
+                db = _db()
+                db.execute("BEGIN;")
+                db.executemany("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?);", rows)
+                db.execute("COMMIT;")
+        except sqlite3.Error as e:
+            logger.debug(f"Couldn't store patch states: {e}")
+    logger.info(f"Patch state cache: {len(entries)} bundles, {len(stale)} read.")
+    return len(stale)
@@ -0,0 +1,210 @@
+"""Persistent index of the translations tree, so searches don't need to walk it.
+Directories are rescanned only when their mtime changed, file headers only when the file did."""
+import os
+import sqlite3
+from threading import Lock
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from . import logger
+from .constants import CACHE_FOLDER, TRANSLATION_FOLDER
+from .types import TranslationFile
+
+DB_FILE = CACHE_FOLDER / "tlindex.db"
+
+_DB: Optional[sqlite3.Connection] = None
+_DB_PID = None
+_LOCK = Lock()
+
+
+class TlHeader(NamedTuple):
+    path: str
+    type: str
+    bundle: str
+    storyId: str
+    modified: Optional[int]
+    humanTl: bool
+
+
+def _db() -> sqlite3.Connection:
+    global _DB, _DB_PID
+    if _DB is None or _DB_PID != os.getpid():
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _DB = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None, check_same_thread=False)
+        _DB.execute("PRAGMA journal_mode = WAL;")
+        _DB.execute("PRAGMA synchronous = NORMAL;")
+        _DB.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, type TEXT, mtime INTEGER);")
+        _DB.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dir TEXT, type TEXT, "
+            "[set] TEXT, [group] TEXT, id TEXT, name TEXT, "
+            "size INTEGER, mtime INTEGER, bundle TEXT, storyId TEXT, modified INTEGER, humanTl INTEGER);"
+        )
+        _DB.execute("CREATE INDEX IF NOT EXISTS files_dir ON files (dir);")
+        _DB.execute("CREATE INDEX IF NOT EXISTS files_type ON files (type);")
+        _DB_PID = os.getpid()
+    return _DB
+
+
+def _storyParts(relDirs: list[str], name: str) -> tuple:
+    """Return set, group, id for a file from its dirs below the type root.
+    Parts are told apart by dir name length like the old walk.
+    Files directly in the root (lyrics, preview) use their stem as id."""
+    parts = {5: None, 2: None, 4: None}
+    for d in relDirs:
+        if len(d) in parts:
+            parts[len(d)] = d
+    if not relDirs:
+        parts[4] = name.rsplit(".", 1)[0]
+    return parts[5], parts[2], parts[4]
+
+
+def refresh(tlType: str):
+    """Bring the index of translations/<tlType> up to date."""
+    root = TRANSLATION_FOLDER.joinpath(tlType).as_posix()
+    db = _db()
+    with _LOCK:
+        known = dict(db.execute("SELECT path, mtime FROM dirs WHERE type = ?;", (tlType,)))
+        children: dict[str, list[str]] = dict()
+        for d in known:
+            children.setdefault(d.rpartition("/")[0], list()).append(d)
+
+        seen = set()
+        changed: list[tuple[str, int, list[str]]] = list()
+        stack = [root]
+        while stack:
+            d = stack.pop()
+            try:
+                mtime = os.stat(d).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(d)
+            if known.get(d) == mtime:
+                stack.extend(children.get(d, ()))
+                continue
+            files = list()
+            with os.scandir(d) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append(f"{d}/{entry.name}")
+                    elif entry.name.endswith(".json"):
+                        files.append(entry.name)
+            changed.append((d, mtime, files))
+
+        removed = known.keys() - seen
+        if not changed and not removed:
+            return
+        db.execute("BEGIN;")
+        try:
+            for d in removed:
+                db.execute("DELETE FROM dirs WHERE path = ?;", (d,))
+                db.execute("DELETE FROM files WHERE dir = ?;", (d,))
+            for d, mtime, files in changed:
+                db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?);", (d, tlType, mtime))
+                old = {p for p, in db.execute("SELECT path FROM files WHERE dir = ?;", (d,))}
+                new = {f"{d}/{f}": f for f in files}
+                db.executemany("DELETE FROM files WHERE path = ?;", ((p,) for p in old - new.keys()))
+                relDirs = d[len(root) + 1 :].split("/") if d != root else []
+                db.executemany(
+                    "INSERT INTO files (path, dir, type, [set], [group], id, name) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?);",
+                    ((p, d, tlType, *_storyParts(relDirs, new[p]), new[p]) for p in new.keys() - old),
+                )
+            db.execute("COMMIT;")
+        except BaseException:
+            db.execute("ROLLBACK;")
+            raise
+    logger.debug(f"Translation index of {tlType}: {len(changed)} dirs rescanned, {len(removed)} removed")
+
+
+def search(tlType: str, targetGroup=None, targetId=None, targetIdx=None, targetSet=None) -> list[str]:
+    """Return translation file paths of the given type, filtered like patch.searchFiles."""
+    refresh(tlType)
+    query = "SELECT path FROM files WHERE type = ?"
+    params = [tlType]
+    # Like the old walk, filters only apply to types that have that level.
+    for col, val in (("[set]", targetSet), ("[group]", targetGroup), ("id", targetId)):
+        if val:
+            query += f" AND ({col} IS NULL OR {col} = ?)"
+            params.append(val)
+    # Lyrics & preview are selected by id only.
+    if targetIdx and not (targetId and tlType in ("lyrics", "preview")):
+        query += " AND substr(name, 1, ?) = ?"
+        params.extend((len(targetIdx), targetIdx))
+    with _LOCK:
+        return [p for p, in _db().execute(query + " ORDER BY path;", params)]
+
+
+def header(path) -> Optional[TlHeader]:
+    """Return cached header fields of an indexed translation file, reading them again if it changed.
+    None if the file isn't indexed or can't be read."""
+    path = os.fspath(path).replace(os.sep, "/")
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    with _LOCK:
+        row = _db().execute(
+            "SELECT type, size, mtime, bundle, storyId, modified, humanTl FROM files WHERE path = ?;", (path,)
+        ).fetchone()
+    if row is None:
+        return None
+    tlType, size, mtime, *fields = row
+    if size == st.st_size and mtime == st.st_mtime_ns and fields[0] is not None:
+        return TlHeader(path, tlType, fields[0], fields[1], fields[2], bool(fields[3]))
+
+    return _peekHeader(path, tlType, st)
+
+
+def headers(tlType: str, paths) -> dict:
+    """Like header() for many files of one type, reading the index in a single query.
+    Keyed by the given paths, files that aren't indexed or can't be read are left out."""
+    refresh(tlType)
+    with _LOCK:
+        rows = {
+            row[0]: row[1:]
+            for row in _db().execute(
+                "SELECT path, size, mtime, bundle, storyId, modified, humanTl FROM files WHERE type = ?;",
+                (tlType,),
+            )
+        }
+    found = dict()
+    for path in paths:
+        key = os.fspath(path).replace(os.sep, "/")
+        row = rows.get(key)
+        if row is None:
+            continue
+        try:
+            st = os.stat(key)
+        except OSError:
+            continue
+        size, mtime, *fields = row
+        if size == st.st_size and mtime == st.st_mtime_ns and fields[0] is not None:
+            found[path] = TlHeader(key, tlType, fields[0], fields[1], fields[2], bool(fields[3]))
+        elif (h := _peekHeader(key, tlType, st)) is not None:
+            found[path] = h
+    return found
+
+
+def _peekHeader(path: str, tlType: str, st: os.stat_result) -> Optional[TlHeader]:
+    """Read and index the header of a file. Returns None if it can't be read,
+    loading the file reports the error then."""
+    try:
+        tlFile = TranslationFile.peek(Path(path))
+        h = TlHeader(
+            path,
+            tlType,
+            tlFile.bundle,
+            tlFile.data.get("storyId", ""),
+            tlFile.data.get("modified"),
+            bool(tlFile.data.get("humanTl")),
+        )
+    except Exception as e:
+        logger.debug(f"Can't read the header of {path}: {repr(e)}")
+        return None
+    with _LOCK:
+        _db().execute(
+            "UPDATE files SET size = ?, mtime = ?, bundle = ?, storyId = ?, modified = ?, humanTl = ? "
+            "WHERE path = ?;",
+            (st.st_size, st.st_mtime_ns, *h[2:], path),
+        )
+    return h
@@ -1,45 +1,77 @@
 import json
 import os
-from dataclasses import asdict, astuple, dataclass
+import re
+from functools import cache, total_ordering
 from pathlib import Path, PurePath
+from time import perf_counter
 from typing import TYPE_CHECKING, Generator, Optional
 
-import regex
-import UnityPy
-
-from . import utils
+from . import patchstate, utils
 from .constants import GAME_ASSET_ROOT, BUNDLE_BASE_KEY
 
 if TYPE_CHECKING:
     from UnityPy.files import ObjectReader
 
 
-@dataclass
+@total_ordering
 class StoryId:
-    type: str = "story"
-    set: str = None
+    """Immutable and hashable, orders like the type/set/group/id/idx file layout.
+    Use replace() for changed copies."""
+
+    __slots__ = ("type", "set", "group", "id", "idx", "_key")
     setLen = 5
-    group: str = None
     groupLen = 2
-    id: str = None
     idLen = 4
-    idx: str = None
     idxLen = 3
     idOnlyGroup = ("lyrics", "preview")
 
-    def __post_init__(self):
-        if self.type in self.idOnlyGroup:
-            if not self.id and self.idx:
-                self.id = self.idx
-            self.idx = None
-            self.group = None
-            self.set = None
+    def __init__(self, type="story", set=None, group=None, id=None, idx=None):
+        if type in self.idOnlyGroup:
+            if not id and idx:
+                id = idx
+            idx = group = set = None
+        key = (type, set, group, id, idx)
+        for name, val in zip(self.__slots__, key):
+            object.__setattr__(self, name, val)
+        object.__setattr__(self, "_key", key)
+
+    def __setattr__(self, name, val):
+        raise AttributeError("StoryId is immutable, use replace()")
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return StoryId, self._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StoryId):
+            return NotImplemented
+        return self._key == other._key
+
+    def __lt__(self, other) -> bool:
+        if not isinstance(other, StoryId):
+            return NotImplemented
+        return self._sortKey() < other._sortKey()
+
+    def _sortKey(self):
+        return tuple("" if x is None else x for x in self._key)
+
+    def __repr__(self) -> str:
+        return "StoryId({})".format(", ".join(f"{k}={v!r}" for k, v in zip(self.__slots__, self._key)))
 
     def __str__(self) -> str:
         """Return the joined numeric parts, as written in tlFiles"""
-        return "".join(x for x in astuple(self)[1:] if x is not None)
+        return "".join(x for x in self._key[1:] if x is not None)
+
+    def replace(self, **changes) -> "StoryId":
+        """Return a copy with the given parts changed."""
+        return StoryId(**{**dict(zip(self.__slots__, self._key)), **changes})
 
     @classmethod
+    @cache
     def parse(cls, text_type, s):
         if text_type in cls.idOnlyGroup:
             return cls(type=text_type, id=s)
@@ -49,6 +81,7 @@ class StoryId:
             return cls(type=text_type, group=s[:2], id=s[2:6], idx=s[6:])
 
     @classmethod
+    @cache
     def parseFromPath(cls, text_type: str, path: str):
         """Given a text type (story, lyrics, etc.) and a game data filepath,
         extract and return the group, id, and index."""
@@ -72,11 +105,12 @@ class StoryId:
     @classmethod
     def queryfy(cls, storyId: "StoryId"):
         """Returns a new StoryId with attributes usable in SQL"""
-        parts = asdict(storyId)
-        for k, v in parts.items():
-            if v is None:
-                parts[k] = "_" * getattr(storyId, f"{k}Len", 0)
-        return cls(*parts.values())
+        return cls(
+            *(
+                "_" * getattr(cls, f"{k}Len", 0) if v is None else v
+                for k, v in zip(cls.__slots__, storyId._key)
+            )
+        )
 
     @classmethod
     def fromLegacy(cls, group, id, idx):
@@ -88,9 +122,9 @@ class StoryId:
     def asTuple(self, validOnly=False):
         if validOnly:
             # Faster with the list comp for some extra mem cost, apparently
-            return tuple([x for x in astuple(self) if x is not None])
+            return tuple([x for x in self._key if x is not None])
         else:
-            return astuple(self)
+            return self._key
 
     def asPath(self, includeIdx=False):
         offset = None if includeIdx else -1
@@ -105,13 +139,159 @@ class StoryId:
             raise AttributeError
 
 
+class TrackedDict(dict):
+    """A dict that reports changes to its owning TranslationFile. Assigned dicts/lists are stored as is,
+    see _adopt(). Copies and pickles are plain dicts."""
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: "TranslationFile", data: dict = ()):
+        self._owner = owner
+        dict.__init__(self, data)
+        for k, v in data.items():
+            if isinstance(v, (dict, list)):
+                dict.__setitem__(self, k, _track(v, owner))
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def __setitem__(self, key, val):
+        if isinstance(val, (dict, list)):
+            # Only by identity, comparing contents would cost the size of val on every assignment.
+            if dict.get(self, key) is val:
+                return
+            _adopt(val, self._owner)
+        elif key in self and dict.__getitem__(self, key) == val:
+            return
+        dict.__setitem__(self, key, val)
+        self._owner._mutated()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owner._mutated()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, key, *default):
+        if key in self:
+            self._owner._mutated()
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._owner._mutated()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, other=(), **kwargs):
+        for k, v in dict(other, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        if self:
+            self._owner._mutated()
+        dict.clear(self)
+
+
+class TrackedList(list):
+    """A list that reports changes to its owning TranslationFile, see TrackedDict."""
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: "TranslationFile", data: list = ()):
+        self._owner = owner
+        list.__init__(self, [_track(v, owner) if isinstance(v, (dict, list)) else v for v in data])
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def _changed(self, fn, *args, **kwargs):
+        self._owner._mutated()
+        return fn(self, *args, **kwargs)
+
+    def __setitem__(self, idx, val):
+        if isinstance(idx, slice):
+            val = [_adopt(v, self._owner) for v in val]
+        else:
+            val = _adopt(val, self._owner)
+        self._changed(list.__setitem__, idx, val)
+
+    def __delitem__(self, idx):
+        self._changed(list.__delitem__, idx)
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        return self._changed(list.__imul__, n)
+
+    def append(self, val):
+        self._changed(list.append, _adopt(val, self._owner))
+
+    def extend(self, vals):
+        self._changed(list.extend, [_adopt(v, self._owner) for v in vals])
+
+    def insert(self, idx, val):
+        self._changed(list.insert, idx, _adopt(val, self._owner))
+
+    def pop(self, idx=-1):
+        return self._changed(list.pop, idx)
+
+    def remove(self, val):
+        self._changed(list.remove, val)
+
+    def clear(self):
+        self._changed(list.clear)
+
+    def sort(self, *, key=None, reverse=False):
+        self._changed(list.sort, key=key, reverse=reverse)
+
+    def reverse(self):
+        self._changed(list.reverse)
+
+
+def _track(obj, owner: "TranslationFile"):
+    """Return obj as a container tracked by owner, copying it if needed. Only for data nothing else holds,
+    like freshly read files. Non-containers and untracked owners pass through."""
+    if owner.readOnly:
+        return obj
+    elif isinstance(obj, dict):
+        if type(obj) is not TrackedDict or obj._owner is not owner:
+            return TrackedDict(owner, obj)
+    elif isinstance(obj, list):
+        if type(obj) is not TrackedList or obj._owner is not owner:
+            return TrackedList(owner, obj)
+    return obj
+
+
+def _adopt(obj, owner: "TranslationFile"):
+    """Return obj unchanged, to be stored in owner's data. Callers may still hold and change containers
+    they assign, like with plain dicts, so those aren't copied. Their changes can't be tracked and owner
+    falls back to comparing content."""
+    if isinstance(obj, (dict, list)) and getattr(obj, "_owner", None) is not owner:
+        owner._untracked = True
+    return obj
+
+
 class TranslationFile:
     latestVersion = 6
     ver_offset_mdb = 100
-    textBlacklist = regex.compile(r"^タイトルコール$|イベントタイトルロゴ表示.*|※*ダミーテキスト|^欠番$")
+    textBlacklist = re.compile(r"^タイトルコール$|イベントタイトルロゴ表示.*|※*ダミーテキスト|^欠番$")
 
     def __init__(self, file: Path = None, load=True, readOnly=False):
         self.readOnly = readOnly
+        # Changes are counted by the tracked containers, see snapshot().
+        self._generation = 0
+        self._savedGeneration = -1
+        self._snapshot = None
+        # Set when containers that can't be tracked are added, see _adopt().
+        self._untracked = False
         if load:
             if not file:
                 raise RuntimeError("Attempting to load tlfile but no file provided.")
@@ -123,12 +303,19 @@ class TranslationFile:
             self.fileExists = False
 
     class TextData:
+        indexedKeys = ("blockIdx", "pathId", "jpText")
+
         def __init__(self, root: "TranslationFile", data=None) -> None:
             self.root = root
             self.map = None
+            self._indexes: dict[str, tuple[int, dict]] = dict()
+            # Blocks passed in are the caller's, the file's own get tracked.
+            track = _adopt if data is not None else _track
             if data is None:
                 data = root.textBlocks
-            self.data = self.toInterchange(data)
+            self.data = track(self.toInterchange(data), root)
+            if self.map is not None:
+                self.map = {e["jpText"]: e for e in self.data}
 
         def get(self, key, default=None):
             if isinstance(key, str) and self.map:
@@ -142,13 +329,14 @@ class TranslationFile:
                 raise NotImplementedError
 
         def set(self, key, val, idx: int = None):
+            self._indexes.clear()
             if isinstance(key, int) and idx in (None, key):
                 self.data[key] = val
             elif idx:
                 self.data[idx][key] = val
             elif self.map is not None:
                 if key not in self.map:
-                    self.data.append({"jpText": key, "enText":val})
+                    self.data.append(_track({"jpText": key, "enText": val}, self.root))
                     self.map[key] = self.data[-1]
                 else:
                     self.map[key]["jpText"] = key
@@ -178,8 +366,34 @@ class TranslationFile:
             return self.toNative()
 
         def find(self, key, val) -> dict:
+            if self._useIndex(key):
+                pos = self._index(key).get(val)
+                return self.data[pos[0]] if pos else None
             return next((x for x in self.data if x.get(key) == val), None)
 
+        def findIdx(self, key, val, near=0) -> Optional[int]:
+            """Return the position of the block where key == val, closest to near if there are several."""
+            if self._useIndex(key):
+                pos = self._index(key).get(val)
+            else:
+                pos = [i for i, x in enumerate(self.data) if x.get(key) == val]
+            return min(pos, key=lambda i: abs(i - near)) if pos else None
+
+        def _useIndex(self, key) -> bool:
+            """Indexes are only kept when all changes are tracked, otherwise they could go stale."""
+            return key in self.indexedKeys and not (self.root.readOnly or self.root._untracked)
+
+        def _index(self, key) -> dict:
+            """Return a value -> positions lookup for key, built on first use and after any change."""
+            gen = self.root._generation
+            idx = self._indexes.get(key)
+            if idx is None or idx[0] != gen:
+                lookup = dict()
+                for i, block in enumerate(self.data):
+                    lookup.setdefault(block.get(key), []).append(i)
+                idx = self._indexes[key] = (gen, lookup)
+            return idx[1]
+
         def toInterchange(self, data=None) -> list[dict]:
             data = self.data if data is None else data
             self._nativeData = data  # todo: change the whole system
@@ -224,6 +438,7 @@ class TranslationFile:
             self.data["text"] = self.TextData(self, val)
         elif self.version == -2:
             self.data = self.TextData(self, val)
+            self._mutated()
         else:
             raise NotImplementedError
 
@@ -266,7 +481,7 @@ class TranslationFile:
         elif self.version == -2:
             return
         else:
-            isN = regex.compile(r"\d+")
+            isN = re.compile(r"\d+")
             g, id, idx = self.file.parts[
                 -3:
             ]  # project structure provides at least 3 levels, luckily
@@ -283,20 +498,38 @@ class TranslationFile:
         self.init()
 
     def save(self, update=True):
-        if self.fileExists and self._snapshot == json.dumps(
-            self.data, ensure_ascii=False, default=utils._to_json
-        ):
+        if self.fileExists and not self.isModified:
             return
         assert self.file
         if update and 3 < self.version < self.ver_offset_mdb:
             self.data["modified"] = utils.currentTimestamp()
         utils.writeJson(self.file, self.data)
+        self.fileExists = True
+        self.snapshot()
 
-    def snapshot(self, copyFrom=None):
+    @property
+    def isModified(self) -> bool:
+        if self._snapshot is not None:
+            return self._snapshot != self._serialize()
+        # Read-only files aren't tracked so can't tell.
+        return self.readOnly or self._generation != self._savedGeneration
+
+    def _mutated(self):
+        self._generation += 1
+
+    def _serialize(self):
+        return json.dumps(self.data, ensure_ascii=False, default=utils._to_json)
+
+    def snapshot(self, copyFrom: "TranslationFile" = None):
+        """Mark the current data as the unmodified state.
+        With copyFrom, compare against that file's data instead, for re-creating an existing file."""
         if self.readOnly:
             return
         elif copyFrom:
-            self._snapshot = copyFrom._snapshot
+            # Separate objects, so this needs the full content comparison. Only possible if
+            # copyFrom is still in its saved state, otherwise it's always considered modified.
+            self._snapshot = None if copyFrom.isModified else copyFrom._serialize()
+            self._savedGeneration = -1
             self.fileExists = copyFrom.fileExists
             # Gets written correctly on save anyway but copyFrom means
             # we're trying to "restore" a state (partially):
@@ -304,7 +537,8 @@ class TranslationFile:
             if mod:
                 self.data["modified"] = mod
         else:
-            self._snapshot = json.dumps(self.data, ensure_ascii=False, default=utils._to_json)
+            self._snapshot = self._serialize() if self._untracked else None
+            self._savedGeneration = self._generation
 
     def setFile(self, file: Path):
         self.file = file
@@ -315,9 +549,11 @@ class TranslationFile:
         self.escapeNewline = self.type in ("race", "preview", "mdb", "lyrics")
         if self.type == "mdb" and self.file.parent.name == "character_system_text":
             self.escapeNewline = False
+        self._untracked = False
         if self.type == "dict":
             self.data = self.TextData(self)
         else:
+            self.data = _track(self.data, self)
             self.data["text"] = self.TextData(self)
         if snapshot:
             self.snapshot()
@@ -330,6 +566,16 @@ class TranslationFile:
         c.init(snapshot)
         return c
 
+    @classmethod
+    def peek(cls, file: Path) -> "TranslationFile":
+        """Load only the file's metadata (bundle, storyId, modified, humanTl, etc.), skipping the text.
+        The result is read-only and has no textBlocks."""
+        c = cls(file, load=False, readOnly=True)
+        c.data = utils.peekJson(file, "text")
+        c.fileExists = True
+        c.version = c._getVersion()
+        return c
+
     @classmethod
     def rename(cls, tlFile: "TranslationFile", newName: str = None):
         """Renames the physical file in the same dir. Dev helper method."""
@@ -358,6 +604,9 @@ class GameBundle:
         self._patchedState = None
         self.patchedTime = None
         self.bundle_key = bundle_key # encryption key from meta
+        self._trees: dict[int, dict] = dict()
+        self._dirtyTrees: set[int] = set()
+        self.treeStats = {"parsed": 0, "hits": 0, "parseTime": 0.0}
 
         if load:
             self.load()
@@ -380,79 +629,182 @@ class GameBundle:
     def readPatchState(self, customPath=None):
         if not customPath and self._patchedState is not None:
             return self._patchedState
-        try:
-            with open(customPath or self.bundlePath, "rb") as f:
-                f.seek(-7, os.SEEK_END)
-                modified = f.read(5)
-                mark = f.read(2)
-                if mark == self.editMark:
-                    self._patchedState = True
-                    # Exception handling removed as I don't see how it would except
-                    # The actual issue is it could not be a timestamp... todo?
-                    modified = int.from_bytes(modified, byteorder="big")
-                    self.patchedTime = modified
-                else:
-                    self._patchedState = False
-        except Exception:
-            self._patchedState = False
+        self._patchedState, modified = patchstate.read(customPath or self.bundlePath)
+        if self._patchedState:
+            self.patchedTime = modified
         return self._patchedState
 
     def getAssetData(self, pathId: int):
+        """Return the parsed typetree of an object, parsing it only once per load.
+        Changes must be registered with setAssetData to be saved."""
+        tree = self._trees.get(pathId)
+        if tree is not None:
+            self.treeStats["hits"] += 1
+            return tree
         if a := self.assets.get(pathId):
-            return a.read_typetree()
+            t = perf_counter()
+            tree = self._trees[pathId] = a.read_typetree()
+            self.treeStats["parseTime"] += perf_counter() - t
+            self.treeStats["parsed"] += 1
+            return tree
         else:
             return None
 
-    def load(self):
+    def setAssetData(self, pathId: int, tree: dict = None):
+        """Mark an object's typetree as changed, to be written back on save."""
+        if tree is not None:
+            self._trees[pathId] = tree
+        elif pathId not in self._trees:
+            return
+        self._dirtyTrees.add(pathId)
+
+    @property
+    def rootData(self) -> dict:
+        return self.getAssetData(self.rootAsset.path_id)
+
+    def readTextClips(self) -> dict[int, dict]:
+        """Parse all text clips of a story timeline in one go. Returns {pathId: typetree}."""
+        clips = dict()
+        for block in self.rootData["BlockList"]:
+            for clip in block["TextTrack"]["ClipList"]:
+                pathId = clip["m_PathID"]
+                obj = self.assets.get(pathId)
+                if obj is not None and obj.serialized_type.nodes:
+                    clips[pathId] = self.getAssetData(pathId)
+        return clips
+
+    def flushAssetData(self):
+        for pathId in self._dirtyTrees:
+            self.assets[pathId].save_typetree(self._trees[pathId])
+        self._dirtyTrees.clear()
+
+    def treeStatsSummary(self) -> str:
+        stats = self.treeStats
+        avg = stats["parseTime"] / stats["parsed"] if stats["parsed"] else 0
+        return (
+            f"Typetrees: {stats['parsed']} parsed in {stats['parseTime']:.3f}s, {stats['hits']} cache hits "
+            f"(~{stats['hits'] * avg:.3f}s saved)"
+        )
+
+    def load(self, raw: memoryview = None):
+        """Parse the bundle, from the file or from raw contents returned by read() (decrypted in place)."""
+        import UnityPy
+
+        if raw is not None:
+            if self.bundle_key != 0 and len(raw) > 256:
+                self._crypt(raw)
+            self.data = self._loadBuffer(raw)
         # UnityPy does not error and loads empty files
-        if not self.exists:
+        elif not self.exists:
             raise FileNotFoundError
-        # We'll just assume nobody will use this to read massive files. Hehe.
-        if self.bundle_key == 0:
+        elif self.bundle_key == 0:
             self.data = UnityPy.load(str(self.bundlePath))
         else:
-            file_data = self.bundlePath.read_bytes()
-            if len(file_data) > 256:
-                file_data = self._decrypt(file_data)
-            self.data = UnityPy.load(file_data)
+            self.data = self._loadBuffer(self._readDecrypted())
         if self._autoloaded:
             self.readPatchState()
+        self._trees.clear()
+        self._dirtyTrees.clear()
         self.rootAsset: "ObjectReader" = next(iter(self.data.container.values())).get_obj()
         self.assets: dict[str, "ObjectReader"] = self.rootAsset.assets_file.files
         return self
 
+    def _loadBuffer(self, buf: memoryview):
+        import UnityPy
+
+        # Unnamed streams get named by their hash, which writable memoryviews don't support.
+        env = UnityPy.Environment()
+        env.load_file(buf, name=self.bundleName)
+        # Set by UnityPy.load() for single files, used to save.
+        env.file = env.files[self.bundleName]
+        return env
+
+    def _readDecrypted(self) -> memoryview:
+        """Read the bundle into a single preallocated buffer and decrypt it in place.
+        Keeps peak memory at ~1x the bundle size, the file isn't held open/mapped after."""
+        view = self.read()
+        if len(view) > 256:
+            self._crypt(view)
+        return view
+
+    def read(self) -> memoryview:
+        """Read the bundle file as is into a single preallocated, writable buffer."""
+        if not self.exists:
+            raise FileNotFoundError(self.bundlePath)
+        with open(self.bundlePath, "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            buf = bytearray(size)
+            view = memoryview(buf)
+            nRead = 0
+            while nRead < size:
+                n = f.readinto(view[nRead:])
+                if not n:
+                    break
+                nRead += n
+        return view[:nRead]
+
     def _decrypt(self, data:bytes):
-        final_key = self._create_final_key()
         decrypted_data = bytearray(data)
-        for i in range(256, len(decrypted_data)):
-            decrypted_data[i] ^= final_key[i % len(final_key)]
+        self._crypt(decrypted_data)
         return bytes(decrypted_data)
 
+    def _crypt(self, buf: bytearray, start=256):
+        """XOR buf in place from start onwards. XOR-based, so works both ways."""
+        tile, tileInt = _cryptTile(self.bundle_key, start)
+        tileLen = len(tile)
+        view = memoryview(buf)
+        # Python's big ints XOR a whole tile in one C-level op, which is far faster than looping bytes.
+        for pos in range(start, len(buf), tileLen):
+            chunk = view[pos : pos + tileLen]
+            n = len(chunk)
+            key = tileInt if n == tileLen else int.from_bytes(tile[:n], "little")
+            view[pos : pos + n] = (int.from_bytes(chunk, "little") ^ key).to_bytes(n, "little")
+
     def _create_final_key(self):
-        base_key = bytes.fromhex(BUNDLE_BASE_KEY)
-        bundle_key = self.bundle_key.to_bytes(8, byteorder="little", signed=True)
-        base_len = len(base_key)
-        final_key = bytearray(base_len * 8)
-        for i, b in enumerate(base_key):
-            baseOffset = i << 3 # i * 8
-            for j, k in enumerate(bundle_key):
-                final_key[baseOffset + j] = b ^ k
-        return final_key
+        return _finalKey(self.bundle_key)
 
     def save(self, dstFolder: Path = None, dstName: str = None):
         if not self.data:
             return
 
-        b = self.data.file.save(packer="lz4")
-        if self.bundle_key != 0:
-            b = self._decrypt(b) # XOR-based, so works both ways
-        b += self.patchData
+        self.write(self.pack(), dstFolder, dstName)
+
+    def pack(self) -> bytes:
+        """Repack the bundle for writing later with write(), unencrypted."""
+        self.flushAssetData()
+        return self.data.file.save(packer="lz4")
+
+    def write(self, data: bytes, dstFolder: Path = None, dstName: str = None) -> Path:
+        """Write data returned by pack(), encrypting it on the way and adding the patch mark."""
+        fp = self._dstPath(dstFolder, dstName)
+        with open(fp, "wb") as f:
+            if self.bundle_key != 0:
+                self._writeCrypted(f, data)
+            else:
+                f.write(data)
+            f.write(self.patchData)
+        tail = (data[-7:] + self.patchData)[-7:]
+        patchstate.put(fp, patchstate.parseTail(tail))
+        self.isPatched = True
+        return fp
+
+    def _dstPath(self, dstFolder: Path = None, dstName: str = None) -> Path:
         fn = dstName or self.bundleName
         fp = ((dstFolder / fn[0:2]) if dstFolder else self.bundlePath.parent) / fn
         fp.parent.mkdir(parents=True, exist_ok=True)
-        with open(fp, "wb") as f:
-            f.write(b)
-        self.isPatched = True
+        return fp
+
+    def _writeCrypted(self, f, data: bytes, start=256):
+        """Encrypt and write data one tile at a time, avoiding a full-size copy."""
+        view = memoryview(data)
+        f.write(view[:start])
+        tile, tileInt = _cryptTile(self.bundle_key, start)
+        tileLen = len(tile)
+        for pos in range(start, len(data), tileLen):
+            chunk = view[pos : pos + tileLen]
+            n = len(chunk)
+            key = tileInt if n == tileLen else int.from_bytes(tile[:n], "little")
+            f.write((int.from_bytes(chunk, "little") ^ key).to_bytes(n, "little"))
 
     @property
     def exists(self):
@@ -467,3 +819,25 @@ class GameBundle:
     @staticmethod
     def createPath(dstFolder, dstName):
         return PurePath(dstFolder, dstName[0:2], dstName)
+
+
+@cache
+def _finalKey(bundle_key: int) -> bytes:
+    base_key = bytes.fromhex(BUNDLE_BASE_KEY)
+    bundle_key = bundle_key.to_bytes(8, byteorder="little", signed=True)
+    base_len = len(base_key)
+    final_key = bytearray(base_len * 8)
+    for i, b in enumerate(base_key):
+        baseOffset = i << 3 # i * 8
+        for j, k in enumerate(bundle_key):
+            final_key[baseOffset + j] = b ^ k
+    return bytes(final_key)
+
+
+@cache
+def _cryptTile(bundle_key: int, start: int, size=1 << 16) -> tuple[bytes, int]:
+    """Return the final key repeated to ~size bytes, rotated to line up with start, and its int form."""
+    key = _finalKey(bundle_key)
+    phase = start % len(key)
+    tile = (key[phase:] + key[:phase]) * max(1, size // len(key))
+    return tile, int.from_bytes(tile, "little")
@@ -4,7 +4,12 @@ from pathlib import Path, PurePath
 from typing import Union, Optional
 from functools import cache
 
-import regex
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from .constants import DMM_CONFIG, IS_WIN, DB_KEY_BASE
 
@@ -18,6 +23,8 @@ def isParseableInt(x):
 
 
 def isJapanese(text):
+    import regex
+
     # Should be cached according to docs
     return regex.search(
         r"[\p{scx=Katakana}\p{scx=Hiragana}\p{Han}\p{InHalfwidth_and_Fullwidth_Forms}\p{General_Punctuation}]{3,}",
@@ -26,6 +33,8 @@ def isJapanese(text):
 
 
 def isEnglish(text):
+    import regex
+
     return regex.fullmatch(
         r"[^\p{scx=Katakana}\p{scx=Hiragana}\p{Han}\p{InHalfwidth_and_Fullwidth_Forms}。]+",
         text,
@@ -85,14 +94,95 @@ def _to_json(o):
 
 
 def readJson(file: Union[str, PurePath]) -> Union[dict, list]:
+    if orjson:
+        with open(file, "rb") as f:
+            data = f.read()
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # The stdlib is more lenient (NaN, huge ints) and gives the usual errors otherwise.
+            return json.loads(data.decode("utf8"))
     with open(file, "r", encoding="utf8") as f:
         return json.load(f)
 
 
+def peekJson(file: Union[str, PurePath], skipKey="text", peekSize=4096) -> dict:
+    """Read a top-level JSON object without parsing the value of skipKey.
+    Relies on the layout writeJson produces (the skipped value's key and closing bracket on their own
+    4-space indented lines) and only reads the first and last peekSize bytes. Falls back to a full read
+    when the file doesn't match it, when skipKey isn't within the head or when the values after it don't
+    fit in the tail. A multi-line value after skipKey that is larger than the tail and uses the same
+    brackets can't be told apart from it, translation files only have single-line values there."""
+    keyLine = b'\n    "%s": ' % skipKey.encode()
+    with open(file, "rb") as f:
+        head = f.read(peekSize)
+        keyPos = head.find(keyLine)
+        if keyPos != -1:
+            size = f.seek(0, 2)
+            f.seek(max(size - peekSize, keyPos))
+            tail = f.read()
+    try:
+        if keyPos == -1 or size <= peekSize:
+            raise ValueError
+        data = json.loads(head[:keyPos].rstrip().rstrip(b",") + b"\n}")
+        # Values inside the skipped one are indented further, so if the tail starts within it the first
+        # line back at the top level closes it. Anything else means the tail starts after it.
+        m = re.search(rb"\n    (?! )", tail[1:])
+        closing = {b"[": b"]", b"{": b"}"}.get(head[keyPos + len(keyLine) : keyPos + len(keyLine) + 1])
+        if not m or not closing or tail[m.end() + 1 : m.end() + 2] != closing:
+            raise ValueError
+        rest = tail[m.end() + 2 :].strip()
+        if rest.startswith(b","):
+            data.update(json.loads(b"{" + rest[1:]))
+        elif rest != b"}":
+            raise ValueError
+    except ValueError:
+        data = readJson(file)
+        if isinstance(data, dict):
+            data.pop(skipKey, None)
+    return data
+
+
+def _orjsonMismatch(out: bytes) -> bool:
+    """Whether orjson output has things the stdlib writes differently:
+    exponent or tiny floats, and NaN/Infinity (which orjson writes as null)."""
+    if b"null" in out or b"0.0000" in out:
+        return True
+    # Plain substring scans are much faster than a regex here, and these marks are rare in text.
+    for mark in (b"e-", b"e1", b"e2", b"e3"):
+        i = out.find(mark)
+        while i != -1:
+            if out[i - 1 : i].isdigit():
+                return True
+            i = out.find(mark, i + 2)
+    return False
+
+
+def _orjsonDump(data, indent) -> Optional[bytes]:
+    """Serialize data exactly like the stdlib path of writeJson, or return None if orjson can't."""
+    if indent not in (2, 4):
+        return None
+    try:
+        out = orjson.dumps(data, default=_to_json, option=orjson.OPT_INDENT_2)
+    except orjson.JSONEncodeError:
+        return None
+    if _orjsonMismatch(out):
+        return None
+    if indent == 4:
+        # Strings can't contain raw newlines so every line starts with indentation only, just double it.
+        out = b"\n".join([line[: len(line) - len(line.lstrip(b" "))] + line for line in out.split(b"\n")])
+    return out
+
+
 def writeJson(file: Union[str, Path], data, indent=4):
     if not isinstance(file, Path):
         file = Path(file)
     file.parent.mkdir(parents=True, exist_ok=True)
+    out = _orjsonDump(data, indent) if orjson else None
+    if out is not None:
+        with open(file, "wb") as f:
+            f.write(out)
+        return
     with open(file, "w", encoding="utf8", newline="\n") as f:
         json.dump(data, f, ensure_ascii=False, indent=indent, default=_to_json)
 
@@ -4,6 +4,7 @@ from itertools import zip_longest
 from typing import TYPE_CHECKING
 
 from common import patch, constants as const
+from common.meta import MetaCatalog
 from common.types import GameBundle
 
 if const.IS_WIN:
@@ -65,13 +66,12 @@ class AudioPlayer:
 
     def __init__(self, master: "Editor") -> None:
         self.pyaud = pyaudio.PyAudio()
-        self._db = apsw.Connection(f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}", apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY)
+        self._meta = MetaCatalog.get()
         self._mdb = apsw.Connection(str(const.GAME_MASTER_FILE), apsw.SQLITE_OPEN_READONLY)
         self._restoreArgs = restore.parseArgs([])
         self.master = master
 
     def dealloc(self):
-        self._db.close()
         for stream, wavFile in zip(self.outStreams, self.wavFiles):
             if isinstance(stream, pyaudio.PyAudio.Stream):
                 stream.stop_stream()
@@ -89,26 +89,25 @@ class AudioPlayer:
         if reloaded := self.curPlaying[0] != storyId:
             if sType == "home":
                 # sound/c/snd_voi_story_00001_02_1054001.acb
-                stmt = rf"SELECT h FROM a WHERE n LIKE 'sound%{qStoryId.set}\_{qStoryId.group}\_{qStoryId.id}{qStoryId.idx}\.a_b' ORDER BY n ESCAPE '\'"
+                pattern = rf"sound%{qStoryId.set}\_{qStoryId.group}\_{qStoryId.id}{qStoryId.idx}\.a_b"
             elif sType == "lyrics":
-                stmt = f"SELECT h FROM a WHERE n LIKE 'sound/l/{qStoryId.id}/snd_bgm_live_{qStoryId.id}_chara%.a_b' ORDER BY n"
+                pattern = f"sound/l/{qStoryId.id}/snd_bgm_live_{qStoryId.id}_chara%.a_b"
             elif sType == "systext":
-                stmt = f"SELECT h FROM a WHERE n LIKE 'sound/v/{storyId.group}%.a_b' ORDER BY n"
+                pattern = f"sound/v/{storyId.group}%.a_b"
             else:
-                stmt = f"SELECT h FROM a WHERE n LIKE 'sound%{qStoryId}.a_b' ORDER BY n"
-            hashes = self._db.execute(stmt).fetchall()
-            if hashes is None:
+                pattern = f"sound%{qStoryId}.a_b"
+            hashes = [e.hash for e in self._meta.like(pattern, escape="\\")]
+            if not hashes:
                 if sType == "story":
                     idx = int(storyId.idx)
                     if idx > 4 and storyId.group != "06":
-                        storyId.group = "06"
-                        storyId.idx = f"{idx-4:03}"
+                        storyId = storyId.replace(group="06", idx=f"{idx-4:03}")
                         self.play(storyId, voice, sType)
                         return
                 self.master.status.log(f"Couldn't find audio asset for {storyId} -> {qStoryId}.")
                 return
 
-            (acb_hash,), (awb_hash,), *_ = hashes
+            acb_hash, awb_hash, *_ = hashes
             acb_asset = GameBundle.fromName(acb_hash, load=False)
             acb_asset.bundleType = "sound"
             if not acb_asset.exists:
@@ -1,42 +1,27 @@
 import csv
-import apsw
+import os
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path, PurePath
 from typing import Optional, Union
 
 from Levenshtein import ratio as similarity
 
-from common import logger, patch
+from common import logger, patch, tlindex
+from common.meta import MetaCatalog
 import common.constants as const
 from common.utils import sanitizeFilename
 from common.types import StoryId, GameBundle, TranslationFile
 import restore
 
 RESTORE_ARGS = None
-DB_OPEN_MODE = apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY
 
-def queryDB(db=None, storyId: StoryId = None):
-    storyId = StoryId.queryfy(storyId)
-
-    if storyId.type == "story":
-        pattern = f"{storyId.type}/data/{storyId.group}/{storyId.id}/{storyId.type}timeline%{storyId.idx}"
-    elif storyId.type == "home":
-        pattern = f"{storyId.type}/data/{storyId.set}/{storyId.group}/{storyId.type}timeline_{storyId.set}_{storyId.group}_{storyId.id}{storyId.idx}%"
-    elif storyId.type == "race":
-        pattern = f"{storyId.type}/storyrace/text/storyrace_{storyId.group}{storyId.id}{storyId.idx}%"
-    elif storyId.type == "lyrics":
-        pattern = f"live/musicscores/m{storyId.id}/m{storyId.id}_lyrics"
-    elif storyId.type == "preview":
-        pattern = f"outgame/announceevent/loguiasset/ast_announce_event_log_ui_asset_0{storyId.id}"
-
-    externalDb = bool(db)
-    if not externalDb:
-        db = apsw.Connection(f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}", DB_OPEN_MODE)
-    cur = db.execute(f"SELECT h, n, e FROM a WHERE n LIKE '{pattern}';")
-    results = cur.fetchall()
-    if not externalDb:
-        db.close()
-
-    return results
+def queryDB(storyId: StoryId = None):
+    """Return (hash, path, key) of the text assets matching storyId."""
+    if storyId.type != "home" and storyId.set:
+        storyId = storyId.replace(set=None)  # Only home assets have sets
+    return [(e.hash, e.path, e.key) for e in MetaCatalog.get().stories(storyId)]
 
 
 def extractAsset(asset: GameBundle, storyId: StoryId, tlFile=None) -> Union[None, TranslationFile]:
@@ -45,7 +30,7 @@ def extractAsset(asset: GameBundle, storyId: StoryId, tlFile=None) -> Union[None
     if not asset.rootAsset.serialized_type.nodes:
         return
 
-    tree = asset.rootAsset.read_typetree()
+    tree = asset.rootData
     export = {
         "bundle": asset.bundleName,
         "type": args.type,
@@ -61,7 +46,6 @@ def extractAsset(asset: GameBundle, storyId: StoryId, tlFile=None) -> Union[None
 
         for block in tree["textData"]:
             textData = extractText("race", block)
-            transferExisting(storyId, textData)
             export["text"].append(textData)
     elif args.type == "lyrics":
         # data = index.read()
@@ -79,22 +63,21 @@ def extractAsset(asset: GameBundle, storyId: StoryId, tlFile=None) -> Union[None
             if not row:  # fully empty lines
                 continue
             textData = extractText("lyrics", row)
-            transferExisting(storyId, textData)
             export["text"].append(textData)
     elif args.type == "preview":
         export["storyId"] = tree["m_Name"][-4:]
         for block in tree["DataArray"]:
             textData = extractText("preview", block)
-            transferExisting(storyId, textData)
             export["text"].append(textData)
     else:
         export["storyId"] = str(storyId) if args.type == "home" else tree["StoryId"]
         export["title"] = tree["Title"]
+        textClips = asset.readTextClips()
 
         for block in tree["BlockList"]:
             for clip in block["TextTrack"]["ClipList"]:
                 pathId = clip["m_PathID"]
-                textData = extractText(args.type, asset.assets[pathId])
+                textData = extractText(args.type, textClips.get(pathId))
                 if not textData:
                     continue
 
@@ -108,9 +91,8 @@ def extractAsset(asset: GameBundle, storyId: StoryId, tlFile=None) -> Union[None
                     if clipsToUpdate:
                         textData["animData"] = list()
                         for clipPathId in clipsToUpdate:
-                            animAsset = asset.assets[clipPathId]
-                            if animAsset:
-                                animData = animAsset.read_typetree()
+                            animData = asset.getAssetData(clipPathId)
+                            if animData:
                                 animGroupData = dict()
                                 animGroupData["origLen"] = animData["ClipLength"]
                                 animGroupData["pathId"] = clipPathId
@@ -122,11 +104,12 @@ def extractAsset(asset: GameBundle, storyId: StoryId, tlFile=None) -> Union[None
 
                 textData["pathId"] = pathId  # important for re-importing
                 textData["blockIdx"] = block["BlockIndex"]  # to help translators look for specific routes
-                transferExisting(storyId, textData)
                 export["text"].append(textData)
 
+    logger.debug(f"{asset.bundleName}: {asset.treeStatsSummary()}")
     if not export["text"]:
         return  # skip empty text assets
+    transferExisting(storyId, export["text"])
     export["storyId"] = export["storyId"].strip()
     export = TranslationFile.fromData(export)
     if transferExisting.file:
@@ -149,8 +132,9 @@ def extractText(assetType, obj):
             "jpText": obj["Text"],
             "enText": "",
         }
-    elif obj.serialized_type.nodes:
-        tree = obj.read_typetree()
+    elif obj:
+        # obj is the clip's typetree
+        tree = obj
         o = {
             "jpName": tree["Name"],
             "enName": "",  # todo: auto lookup
@@ -171,14 +155,42 @@ def extractText(assetType, obj):
         textColor = tree["ColorTextInfoList"]  # always present
         if textColor:
             o["coloredText"] = [{"jpText": c["Text"], "enText": ""} for c in textColor]
+    else:
+        return None
     return o if o["jpText"] else None
 
 
+def _uniqueAnchors(a: list[str], b: list[str]) -> list[tuple[int, int]]:
+    """Return the longest in-order run of (a, b) positions of texts that occur exactly once in both."""
+    countA, countB = Counter(a), Counter(b)
+    posA = {t: i for i, t in enumerate(a) if countA[t] == 1}
+    pairs = [(posA[t], j) for j, t in enumerate(b) if countB[t] == 1 and t in posA]
+    # Longest increasing subsequence of the a positions (pairs are already ordered by b).
+    tails: list[int] = list()
+    tailPairs: list[int] = list()
+    prev: list[Optional[int]] = [None] * len(pairs)
+    for k, (i, _) in enumerate(pairs):
+        n = bisect_left(tails, i)
+        if n == len(tails):
+            tails.append(i)
+            tailPairs.append(k)
+        else:
+            tails[n] = i
+            tailPairs[n] = k
+        prev[k] = tailPairs[n - 1] if n else None
+    anchors = list()
+    k = tailPairs[-1] if tailPairs else None
+    while k is not None:
+        anchors.append(pairs[k])
+        k = prev[k]
+    return anchors[::-1]
+
+
 class DataTransfer:
     def __init__(self, file: TranslationFile = None, newData: dict = None):
         self.file = file
-        self.offset = 0
         self.simRatio = 0.9 if args.update and args.type != "lyrics" else 0.99
+        self.band = 16  # blocks around the expected position checked for similar text
         self._printedName = False
         if (newData and file):
             if file.data.get("humanTl"):
@@ -191,11 +203,12 @@ class DataTransfer:
             self._printedName = True
         logger.log(level, f"\t{text}")
 
-    def __call__(self, storyId: StoryId, textData):
+    def __call__(self, storyId: StoryId, texts: list[dict]):
+        """Transfer translations of the existing file to the newly extracted text blocks."""
         # Existing files are skipped before reaching here
         # so there's no point in checking when we know the result already.
         # Only continue when forced to.
-        if not args.overwrite or self.file == 0:
+        if not args.overwrite or self.file == 0 or not texts:
             return
 
         if self.file is None:
@@ -209,109 +222,213 @@ class DataTransfer:
 
             self.file = TranslationFile(file)
 
-        textSearch = True
-        targetBlock = None
         textBlocks = self.file.textBlocks
-        txtIdx = 0
-        if "blockIdx" in textData:
-            txtIdx = max(textData["blockIdx"] - 1 - self.offset, 0)
-            if txtIdx < len(textBlocks):
-                targetBlock = textBlocks[txtIdx]
-                if (
-                    not args.upgrade
-                    and similarity(targetBlock["jpText"], textData["jpText"]) < self.simRatio
-                ):
-                    targetBlock = None
-                else:
-                    textSearch = False
-
-        if textSearch:
-            self.print("Searching by text", logger.DEBUG)
-            for i, block in enumerate(textBlocks):
-                if similarity(block["jpText"], textData["jpText"]) > self.simRatio:
-                    self.print(f"Found text at block {i}", logger.DEBUG)
-                    self.offset = txtIdx - i
-                    targetBlock = block
-                    break
-            if not targetBlock:
+        matches = self.align(textBlocks, texts)
+        for j, textData in enumerate(texts):
+            i = matches.get(j)
+            if i is None:
+                # Repeated lines can only be aligned once, reuse any exact match for the rest.
+                i = textBlocks.findIdx("jpText", textData["jpText"], near=self.expectedIdx(textData, j))
+            if i is None:
                 self.print(
                     f"At bIdx/time {textData.get('blockIdx', textData.get('time', 'no_idx'))}: jpText not found in file.",
                     logger.INFO
                 )
-
-        if targetBlock:
+            else:
+                self.transfer(textBlocks[i], textData)
+
+    @staticmethod
+    def expectedIdx(textData: dict, pos: int) -> int:
+        return textData["blockIdx"] - 1 if "blockIdx" in textData else pos
+
+    def align(self, textBlocks, texts: list[dict]) -> dict[int, int]:
+        """Map positions in texts to the existing blocks they correspond to.
+        Texts occurring once in both are aligned first (longest common subsequence) and extended over equal
+        neighbours. The gaps between them are then matched by similarity, within a band around the expected
+        position."""
+        oldTexts = [block["jpText"] for block in textBlocks]
+        matches: dict[int, int] = dict()
+        newPos = range(len(texts))
+        oldPos = range(len(oldTexts))
+        if args.upgrade:
+            # Block indices are trusted here, the jp text is expected to differ.
+            for j, textData in enumerate(texts):
+                if "blockIdx" in textData and 0 <= (i := textData["blockIdx"] - 1) < len(oldTexts):
+                    matches[j] = i
+            if matches:
+                used = set(matches.values())
+                newPos = [j for j in newPos if j not in matches]
+                oldPos = [i for i in oldPos if i not in used]
+        if not newPos or not oldPos:
+            return matches
+
+        a = [oldTexts[i] for i in oldPos]
+        b = [texts[j]["jpText"] for j in newPos]
+        nFuzzy = 0
+        i1 = j1 = 0
+        for i2, j2 in (*_uniqueAnchors(a, b), (len(a), len(b))):
+            # Extend exact runs out of both ends of the gap, mostly repeated lines next to an anchor.
+            while i1 < i2 and j1 < j2 and a[i1] == b[j1]:
+                matches[newPos[j1]] = oldPos[i1]
+                i1, j1 = i1 + 1, j1 + 1
+            end = 0
+            while i2 - end > i1 and j2 - end > j1 and a[i2 - end - 1] == b[j2 - end - 1]:
+                end += 1
+                matches[newPos[j2 - end]] = oldPos[i2 - end]
+            for i, j in self.fuzzyAlign(a, b, i1, i2 - end, j1, j2 - end):
+                matches[newPos[j]] = oldPos[i]
+                nFuzzy += 1
+            if i2 < len(a):
+                matches[newPos[j2]] = oldPos[i2]
+            i1, j1 = i2 + 1, j2 + 1
+        if len(matches) != len(texts) or nFuzzy:
+            self.print(f"Aligned {len(matches)}/{len(texts)} blocks, {nFuzzy} by similarity", logger.DEBUG)
+        return matches
+
+    def fuzzyAlign(self, a: list[str], b: list[str], i1: int, i2: int, j1: int, j2: int):
+        """Yield (a, b) positions of similar texts in the gap a[i1:i2], b[j1:j2], keeping their order."""
+        lo = i1
+        for j in range(j1, j2):
+            if lo >= i2:
+                return
+            expected = min(max(lo, i1 + j - j1), i2 - 1)
+            best, bestRatio = None, self.simRatio
+            for i in range(max(lo, expected - self.band), min(i2, expected + self.band + 1)):
+                r = similarity(a[i], b[j], score_cutoff=bestRatio)
+                if r > bestRatio or (best is None and r >= bestRatio):
+                    best, bestRatio = i, r
+            if best is not None:
+                yield best, j
+                lo = best + 1
+
+    def transfer(self, targetBlock: dict, textData: dict):
+        if args.upgrade:
+            textData["jpText"] = targetBlock["jpText"]
+        textData["enText"] = targetBlock["enText"]
+        if "enName" in targetBlock:
             if args.upgrade:
-                textData["jpText"] = targetBlock["jpText"]
-            textData["enText"] = targetBlock["enText"]
-            if "enName" in targetBlock:
+                textData["jpName"] = targetBlock["jpName"]
+            textData["enName"] = targetBlock["enName"]
+        if "choices" in targetBlock and (choices := textData.get("choices")):
+            self.transferChoices(targetBlock, choices)
+        if "coloredText" in targetBlock and (coloredText := textData.get("coloredText")):
+            for txtIdx, cText in enumerate(coloredText):
                 if args.upgrade:
-                    textData["jpName"] = targetBlock["jpName"]
-                textData["enName"] = targetBlock["enName"]
-            if "choices" in targetBlock and (choices := textData.get("choices")):
-                for txtIdx, choice in enumerate(choices):
-                    try:
-                        if args.upgrade:
-                            choice["jpText"] = targetBlock["choices"][txtIdx]["jpText"]
-                        choice["enText"] = targetBlock["choices"][txtIdx]["enText"]
-                    except IndexError:
-                        self.print(f"New choice at bIdx {targetBlock['blockIdx']}.", logger.WARNING)
-                    except KeyError:
-                        self.print(f"Choice mismatch when attempting data transfer at {txtIdx}", logger.WARNING)
-            if "coloredText" in targetBlock and (coloredText := textData.get("coloredText")):
-                for txtIdx, cText in enumerate(coloredText):
-                    if args.upgrade:
-                        cText["jpText"] = targetBlock["coloredText"][txtIdx]["jpText"]
-                    cText["enText"] = targetBlock["coloredText"][txtIdx]["enText"]
-            if "skip" in targetBlock:
-                textData["skip"] = targetBlock["skip"]
-            if "newClipLength" in targetBlock:
-                textData["newClipLength"] = targetBlock["newClipLength"]
-            # Should be a check on both targetBlock and textData but as it's there's nothing
-            # to extract on unsupported types it will never wrongly transfer either
-            # Also should only transfer when asset is assumed patched, hence upgrade mode
-            if args.upgrade and "origClipLength" in targetBlock:
-                textData["origClipLength"] = targetBlock["origClipLength"]
-                for i, group in enumerate(textData.get("animData", [])):
-                    group["origLen"] = targetBlock["animData"][i]["origLen"]
-
-
-def exportAsset(bundle: Optional[str], path: Union[str, PurePath], db=None, bundle_key:int = 0):
+                    cText["jpText"] = targetBlock["coloredText"][txtIdx]["jpText"]
+                cText["enText"] = targetBlock["coloredText"][txtIdx]["enText"]
+        if "skip" in targetBlock:
+            textData["skip"] = targetBlock["skip"]
+        if "newClipLength" in targetBlock:
+            textData["newClipLength"] = targetBlock["newClipLength"]
+        # Should be a check on both targetBlock and textData but as it's there's nothing
+        # to extract on unsupported types it will never wrongly transfer either
+        # Also should only transfer when asset is assumed patched, hence upgrade mode
+        if args.upgrade and "origClipLength" in targetBlock:
+            textData["origClipLength"] = targetBlock["origClipLength"]
+            for i, group in enumerate(textData.get("animData", [])):
+                group["origLen"] = targetBlock["animData"][i]["origLen"]
+
+    def transferChoices(self, targetBlock: dict, choices: list):
+        for txtIdx, choice in enumerate(choices):
+            try:
+                if args.upgrade:
+                    choice["jpText"] = targetBlock["choices"][txtIdx]["jpText"]
+                choice["enText"] = targetBlock["choices"][txtIdx]["enText"]
+            except IndexError:
+                self.print(f"New choice at bIdx {targetBlock['blockIdx']}.", logger.WARNING)
+            except KeyError:
+                self.print(f"Choice mismatch when attempting data transfer at {txtIdx}", logger.WARNING)
+
+
+def resolveUpdates(tlType: str, files: list[Path]) -> tuple[list[tuple], int]:
+    """Look up the newest bundle of each translation file from the indexed headers, dropping unchanged files
+    before they're parsed. Returns (path, bundle, key) to export, bundle None where exportAsset has to
+    read the file to decide, and the number of dropped files."""
+    tlHeaders = dict() if args.upgrade else tlindex.headers(tlType, files)
+    resolved = list()
+    nDropped = 0
+    for file in files:
+        tlHeader = tlHeaders.get(file)
+        if tlHeader is None:
+            # Not indexed or unreadable, exportAsset reads the file itself and reports any error.
+            logger.debug(f"No indexed header for {file}, resolving it on export.")
+            resolved.append((file, None, 0))
+            continue
+        # Old files may lack a usable storyId in their data, it's taken from the path then.
+        if tlHeader.storyId in ("", "000000000"):
+            resolved.append((file, None, 0))
+            continue
+        if args.skip_mtl and not tlHeader.humanTl:
+            nDropped += 1
+            continue
+        try:
+            bundle, _, bundle_key = queryDB(StoryId.parse(tlType, tlHeader.storyId))[0]
+        except IndexError:
+            resolved.append((file, None, 0))  # logged by exportAsset
+            continue
+        if bundle == tlHeader.bundle:
+            logger.info(f"Bundle {bundle} not changed, skipping.")
+            nDropped += 1
+            continue
+        resolved.append((file, bundle, bundle_key))
+    return resolved, nDropped
+
+
+def getExportDir(storyId: StoryId) -> Path:
+    return args.dst if args.type in ("lyrics", "preview") else args.dst.joinpath(storyId.asPath())
+
+
+def findExport(storyId: StoryId) -> Optional[Path]:
+    return next(getExportDir(storyId).glob(f"{storyId.getFilenameIdx()}*.json"), None)
+
+
+def lookupUpdate(path: Union[str, PurePath]) -> Optional[tuple]:
+    """Find the newest bundle for a translation file to update.
+    Returns (bundle, key, storyId), or None if the file is skipped."""
+    # Decide from metadata alone where possible, the full file is only needed for the data transfer.
+    tlHeader = TranslationFile.peek(path)
+    if args.upgrade and tlHeader.version == TranslationFile.latestVersion:
+        logger.info(f"File already on latest version, skipping: {path}")
+        return None
+    if args.skip_mtl and not tlHeader.data.get("humanTl"):
+        return None
+
+    storyId = StoryId.parse(args.type, tlHeader.getStoryId())
+    try:
+        bundle, _, bundle_key = queryDB(storyId)[0]  # get the newest bundle hash/name
+    except IndexError:
+        logger.error(f"Error looking up {storyId}. Corrupt data or removed asset?")
+        return None
+    if not args.upgrade and bundle == tlHeader.bundle:
+        logger.info(f"Bundle {bundle} not changed, skipping.")
+        return None
+    return bundle, bundle_key, storyId
+
+
+def exportAsset(bundle: Optional[str], path: Union[str, PurePath], bundle_key:int = 0):
     '''Exports an AssetBundle.
        :param path: internal Unity path
        :return: number of files changed'''
 
-    if args.update:  # update mode, path = tlfile, bundle = None
-        assert db is not None
-        tlFile = TranslationFile(path)
-        if args.upgrade and tlFile.version == TranslationFile.latestVersion:
-            logger.info(f"File already on latest version, skipping: {path}")
-            return 0
-        if args.skip_mtl and not tlFile.data.get("humanTl"):
-            return 0
-
-        storyId = StoryId.parse(args.type, tlFile.getStoryId())
-        try:
-            bundle, _, bundle_key = queryDB(db, storyId)[0]  # get the newest bundle hash/name
-        except IndexError:
-            logger.error(f"Error looking up {storyId}. Corrupt data or removed asset?")
-            return 0
-        if not args.upgrade and bundle == tlFile.bundle:
-            logger.info(f"Bundle {bundle} not changed, skipping.")
-            return 0
+    if args.update:  # update mode, path = tlfile, bundle = newest if resolved by resolveUpdates, else None
+        if bundle is None:
+            if (found := lookupUpdate(path)) is None:
+                return 0
+            bundle, bundle_key, storyId = found
+            tlFile = TranslationFile(path)
+        else:
+            tlFile = TranslationFile(path)
+            storyId = StoryId.parse(args.type, tlFile.getStoryId())
         logger.info(f"{'Upgrading' if args.upgrade else 'Updating'} {bundle}")
     else:  # path = unity internal, bundle = newest from SQL lookup
         tlFile = None
         storyId = StoryId.parseFromPath(args.type, path)
 
-    exportDir = (
-        args.dst
-        if args.type in ("lyrics", "preview")
-        else args.dst.joinpath(storyId.asPath())
-    )
+    exportDir = getExportDir(storyId)
 
     # Skip if already exported and we're not overwriting
     if not args.overwrite:
-        file = next(exportDir.glob(f"{storyId.getFilenameIdx()}*.json"), None)
+        file = findExport(storyId)
         if file is not None:
             logger.info(f"Skipping existing: {file.name}")
             return 0
@@ -377,6 +494,13 @@ def parseArgs(args=None):
     ap.add_argument(
         "-nomtl", "--skip-mtl", action="store_true", help="Only extract human translations when updating"
     )
+    ap.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes to extract with, 0 for all cores",
+    )
 
     args = ap.parse_args()
 
@@ -411,61 +535,129 @@ def converToPlainText(args: patch.Args):
     print("Done.")
 
 
-def main(_args: patch.Args = None):
-    global args
-    args = _args or parseArgs(_args)
+def _initWorker(_args, restoreArgs):
+    global args, RESTORE_ARGS
+    args, RESTORE_ARGS = _args, restoreArgs
+    logger.levelFromArgs(args)
+    restore.DEFERRED_META_UPDATES = list()
+
+
+def _exportTask(task: tuple):
+    """Run one export, returns (pid, result, downloaded bundles). result is None on errors."""
+    tlType, dst, bundle, path, bundle_key = task
+    args.type, args.dst = tlType, dst
+    try:
+        result = exportAsset(bundle, path, bundle_key=bundle_key)
+    except Exception:
+        result = None
+    downloaded = list()
+    if restore.DEFERRED_META_UPDATES:
+        downloaded, restore.DEFERRED_META_UPDATES = restore.DEFERRED_META_UPDATES, list()
+    return os.getpid(), result, downloaded
 
-    if args.plaintext:
-        converToPlainText(args)
-        return
 
-    restore.META_DB.execute("BEGIN")
-    nTotal = nSuccess = nFailed = nSkipped = 0
+def buildTasks() -> tuple[list[tuple], int]:
+    """Return the (type, dst, bundle, path, key) exports to run, and the number of unchanged files skipped."""
+    tasks = list()
+    nUnchanged = 0
     if args.update is not None:
         print(f"{'Upgrading' if args.upgrade else 'Updating'} exports...")
-        db = apsw.Connection(f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}", DB_OPEN_MODE)
         logger.setFile("extract.log")
-        try:
-            for type in args.update:  # set correctly by arg parsing
-                args.dst = const.TRANSLATION_FOLDER / type
-                args.type = type
-                files = patch.searchFiles(
-                    type,
-                    args.group,
-                    args.id,
-                    args.idx,
-                    targetSet=args.set,
-                    changed=args.changed,
-                )
-                nFiles = len(files)
-                nTotal += nFiles
-                nSkipped += nFiles
-                print(f"Found {nFiles} files for {type}.")
-                for i, file in enumerate(files):
-                    try:
-                        nSkipped -= exportAsset(None, file, db)
-                    except Exception:
-                        nFailed += 1
-                        logger.error(f"Failed in file {i} of {type}: {file}")
-        finally:
-            db.close()
-            logger.closeFile()
+        for type in args.update:  # set correctly by arg parsing
+            files = patch.searchFiles(
+                type,
+                args.group,
+                args.id,
+                args.idx,
+                targetSet=args.set,
+                changed=args.changed,
+            )
+            resolved, nDropped = resolveUpdates(type, files)
+            nUnchanged += nDropped
+            print(f"Found {len(files)} files for {type}, {nDropped} skipped without changes.")
+            dst = const.TRANSLATION_FOLDER / type
+            tasks.extend((type, dst, bundle, file, bundle_key) for file, bundle, bundle_key in resolved)
     else:
         print(
-            f"Extracting type {args.type}, set {args.set}, group {args.group}, id {args.id}, idx {args.idx} (overwrite: {args.overwrite})\n"
+            f"Extracting type {args.type}, set {args.set}, group {args.group}, id {args.id}, idx {args.idx} "
+            f"(overwrite: {args.overwrite})\n"
             f"from {const.GAME_ASSET_ROOT} to {args.dst}"
         )
         q = queryDB(storyId=StoryId(args.type, args.set, args.group, args.id, args.idx))
-        nTotal = nSkipped = len(q)
-        print(f"Found {nTotal} files.")
-        for bundle, path, bundle_key in q:
-            try:
-                nSkipped -= exportAsset(bundle, path, bundle_key=bundle_key)
-            except Exception:
-                nFailed += 1
-    restore.META_DB.execute("COMMIT")
-    nSuccess = nTotal - nSkipped - nFailed
+        print(f"Found {len(q)} files.")
+        tasks.extend((args.type, args.dst, bundle, path, bundle_key) for bundle, path, bundle_key in q)
+    return tasks, nUnchanged
+
+
+def prefetchTasks(tasks: list[tuple]):
+    """Download the bundles that will be exported up front, instead of stalling the workers on them."""
+    keepExisting = args.update is None and not args.overwrite
+    bundles = list()
+    for tlType, _, bundle, path, _ in tasks:
+        if not bundle or keepExisting and findExport(StoryId.parseFromPath(tlType, path)) is not None:
+            continue
+        bundles.append(GameBundle.fromName(bundle, load=False))
+    restore.prefetch(bundles, RESTORE_ARGS)
+
+
+def collectResults(tasks: list[tuple], results) -> tuple[int, int, dict[int, list[int]]]:
+    """Tally export results, returns (extracted, failed, per worker [extracted, skipped, failed])."""
+    nSuccess = nFailed = 0
+    workerStats: dict[int, list[int]] = dict()
+    for task, (pid, result, downloaded) in zip(tasks, results):
+        stats = workerStats.setdefault(pid, [0, 0, 0])
+        if result is None:
+            nFailed += 1
+            stats[2] += 1
+            if args.update is not None:
+                logger.error(f"Failed in {task[0]} file: {task[3]}")
+        elif result:
+            nSuccess += 1
+            stats[0] += 1
+        else:
+            stats[1] += 1
+        # Meta updates from workers are applied here, within this process' transaction.
+        for bundle in downloaded:
+            restore.markDownloaded(bundle)
+    return nSuccess, nFailed, workerStats
+
+
+def main(_args: patch.Args = None):
+    global args
+    args = _args or parseArgs(_args)
+
+    if args.plaintext:
+        converToPlainText(args)
+        return
+
+    restore.metaDb().execute("BEGIN")
+    tasks, nUnchanged = buildTasks()
+    prefetchTasks(tasks)
+    nTotal = len(tasks)
+    nWorkers = getattr(args, "jobs", 1)
+    pool = None
+    if nWorkers != 1:
+        nWorkers = nWorkers or os.cpu_count()
+        # Make sure workers can load the catalog snapshot instead of decrypting meta each.
+        MetaCatalog.get()
+        pool = ProcessPoolExecutor(nWorkers, initializer=_initWorker, initargs=(args, RESTORE_ARGS))
+    try:
+        if pool:
+            results = pool.map(_exportTask, tasks, chunksize=max(1, nTotal // (nWorkers * 16)))
+        else:
+            results = map(_exportTask, tasks)
+        nSuccess, nFailed, workerStats = collectResults(tasks, results)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        restore.metaDb().execute("COMMIT")
+        logger.closeFile()
+    nSkipped = nTotal - nSuccess - nFailed + nUnchanged
+    if len(workerStats) > 1:
+        for pid, (e, s, f) in sorted(workerStats.items()):
+            logger.info(f"Worker {pid}: Extracted: {e}, Skipped: {s}, Errors: {f}")
     print(f"Processing finished. Extracted: {nSuccess}, Skipped: {nSkipped}, Errors: {nFailed}")
+    print(MetaCatalog.summary())
 
 
 if __name__ == "__main__":
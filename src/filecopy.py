@@ -1,71 +1,37 @@
 import shutil
-import apsw
 from os import makedirs, path
 from pathlib import PurePath
 
-from common import patch, utils, logger
+from common import patch, tlindex, utils, logger
 import common.constants as const
-from common.types import GameBundle, TranslationFile
+from common.meta import MetaCatalog
+from common.types import GameBundle, StoryId, TranslationFile
 
 
-def buildSqlStmt(args):
-    stmt = "select m, h, n from a"
-    firstExpr = True
-
-    def add(expr: str):
-        nonlocal firstExpr, stmt
-        if firstExpr:
-            stmt += f" where {expr}"
-            firstExpr = False
-        else:
-            stmt += f" and {expr}"
-
-    sType = args.type
-    if args.type == "lyrics":
-        args.type = sType = "live"
-    elif args.type == "ruby":
-        sType = "story"
-    if not args.group:
-        args.group = "__"
-    if not args.id:
-        args.id = "____"
-    if not args.idx:
-        args.idx = "___"
-    if not args.set:
-        args.set = "_____"
-
+def getFiles(args):
+    """Return (type, hash, path) of all bundles selected by args."""
+    if args.custom and not (args.path or args.hash):
+        raise SystemExit("No search args given. Pass -h for usage")
+    catalog = MetaCatalog.get()
+    if args.custom:
+        entries = catalog.entries
+    else:
+        sType = {"lyrics": "live", "ruby": "story"}.get(args.type, args.type)
+        storyId = StoryId(
+            args.type,
+            args.set if args.type == "home" else None,
+            args.group,
+            args.id,
+            args.idx if args.type == "ruby" else None,
+        )
+        entries = [e for e in catalog.stories(storyId) if e.type == sType]
     if args.path:
-        add(f"n like '{args.path if args.custom else f'%{args.path}%'}' escape '\\'")
+        found = set(catalog.like(args.path if args.custom else f"%{args.path}%", escape="\\"))
+        entries = [e for e in entries if e in found]
     if args.hash:
-        hashes = ",".join([f"'{h}'" for h in args.hash])
-        add(f"h in ({hashes})")
-    if not args.custom:
-        add(f"m = '{sType}'")
-        if args.type == "story":
-            add(f"n like 'story/data/{args.group}/{args.id}/storytimeline%'")
-        elif args.type == "home":
-            add(f"n like 'home/data/{args.set}/{args.group}/hometimeline_{args.set}_{args.group}_{args.id}%'")
-        elif args.type == "race":
-            add(f"n like 'race/storyrace/text/storyrace_{args.group}{args.id}%'")
-        elif args.type == "live":
-            add(f"n like 'live/musicscores/m{args.id}/m{args.id}_lyrics'")
-        elif args.type == "preview":
-            add(f"n like 'outgame/announceevent/loguiasset/ast_announce_event_log_ui_asset_0{args.id}'")
-        elif args.type == "ruby":
-            storyid = f"{args.group}{args.id}{args.idx}"
-            add(f"n like 'story/data/__/____/ast_ruby_{storyid}'")
-
-    return None if firstExpr else stmt
-
-
-def getFiles(args):
-    mode = apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY
-    with apsw.Connection(f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}", mode) as db:
-        stmt = buildSqlStmt(args)
-        if not stmt:
-            raise SystemExit("Invalid statement. No args given? Pass -h for usage")
-        cur = db.execute(stmt)
-        return cur
+        hashes = set(args.hash)
+        entries = [e for e in entries if e.hash in hashes]
+    return [(e.type, e.hash, e.path) for e in entries]
 
 
 def backup(args):
@@ -73,7 +39,7 @@ def backup(args):
     for type in const.TARGET_TYPES if args.backup is True else [args.backup]:
         files = patch.searchFiles(type, args.group, args.id, args.idx, changed=args.changed)
         for file in files:
-            file = TranslationFile(file)
+            file = tlindex.header(file) or TranslationFile.peek(file)
             copy((file.type, file.bundle, None), args)
 
 
@@ -90,14 +56,17 @@ def removeOldFiles(args):
     isHash = args.remove_old == "hash"
     files = patch.searchFiles(args.dst, None, None, jsonOnly=False)
     print(f"Found {len(files)} files in {args.dst}")
-    mode = apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY
-    with apsw.Connection(f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}", mode) as db:
-        for file in files:
-            q = f"h = '{file.name}'" if isHash else f"n like '%{file.name}'"
-            if not db.execute(f"select h from a where {q}").fetchone():
-                file.unlink()
-                logger.debug(f"Removed {file}")
-                n += 1
+    catalog = MetaCatalog.get()
+    # Backups are named by hash or by the last part of the asset path, also with --full-path.
+    if isHash:
+        names = catalog.byHash
+    else:
+        names = {e.path.rsplit("/", 1)[-1] for e in catalog.entries}
+    for file in files:
+        if file.name not in names:
+            file.unlink()
+            logger.debug(f"Removed {file}")
+            n += 1
     cfg.core["lastBackupPrune"] = ts
     cfg.save()
     return n, len(files)
@@ -153,7 +122,7 @@ def parseArgs(args=None):
         "--custom",
         action="store_true",
         help="Ignore additional argument processing.\n\
-        Pure SQL queries based on --hash and/or --path",
+        Only match --hash and/or --path (SQL LIKE syntax)",
     )
     ap.add_argument("-miss", "--restore-missing", action="store_true", help="Download missing files.")
     ap.add_argument(
@@ -194,7 +163,7 @@ def main(args: patch.Args = None):
         backup(args)
     elif args.remove_old:
         rem, total = removeOldFiles(args)
-        print(f"Removed {rem} old files out of {total} total files from {args.dst}")
+        print(f"Removed {rem} old files out of {total} total files from {args.dst}. {MetaCatalog.summary()}")
     else:
         if args.restore_missing:
             global restore
@@ -204,7 +173,7 @@ def main(args: patch.Args = None):
         n = 0
         for data in getFiles(args):
             n += copy(data, args)
-        print(f"Copied {n} files.")
+        print(f"Copied {n} files. {MetaCatalog.summary()}")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,30 @@
 import argparse
+import multiprocessing
+import os
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # from sys import stdout
 from functools import reduce
 from pathlib import Path
+from queue import Full, Queue, SimpleQueue
+from threading import Event, Thread, get_native_id
 from time import time as now
+from typing import Iterable
 
 import common.constants as const
 import filecopy as backup
 import restore
-from common import patch, logger
+from common import bundlecache, importmanifest, patch, patchstate, tlindex, logger
+from common.meta import MetaCatalog
 from common.types import GameBundle, TranslationFile
-import apsw
+
+# Bytes of translation and bundle data below which threads are used, as process startup would dominate.
+PROCESS_POOL_MIN_COST = 4 << 20
+# Files to check above which reading all patch states of the dst dir at once is faster.
+PATCHSTATE_SCAN_MIN = 1000
+# Bundles each import stage may have waiting for the next one, bounds memory use.
+PIPELINE_DEPTH = 2
+
 
 class ConfigError(Exception):
     pass
@@ -40,6 +53,7 @@ class NoAssetError(PatchError):
 class PatchManager:
     totalFilesProcessed = 0
     totalFilesImported = 0
+    scannedPatchStates = False
 
     def __init__(self, args: argparse.Namespace) -> None:
         self.config(args)
@@ -59,68 +73,271 @@ class PatchManager:
             self.fcArgs = backup.parseArgs([])
             self.fcArgs.restore_missing = False
             self.fcArgs.full_path = False
+        cacheDir = getattr(self.args, "cache_dir", None)
+        self.bundleCache = None
+        if cacheDir:
+            self.bundleCache = bundlecache.BundleCache(cacheDir, int(self.args.cache_max_gb * 2**30))
+
+    @property
+    def importOptions(self) -> str:
+        """Args that change the written bundles, imports with others aren't considered current."""
+        return f"cps={self.args.cps} fps={self.args.fps}"
 
     def start(self):
         startTime = now()
+        commit = patch.gitHead()
         print(
-            f"Importing group {self.args.group or 'all'}, id {self.args.id or 'all'}, idx {self.args.idx or 'all'} "
-            f"from translations/{self.args.type} to {self.args.dst}"
+            f"Importing group {self.args.group or 'all'}, id {self.args.id or 'all'}, "
+            f"idx {self.args.idx or 'all'} from translations/{self.args.type} to {self.args.dst}"
         )
         files = patch.searchFiles(
-            self.args.type, self.args.group, self.args.id, self.args.idx, changed=self.args.changed
+            self.args.type,
+            self.args.group,
+            self.args.id,
+            self.args.idx,
+            changed=self.args.changed,
+            dst=self.args.dst,
         )
         nFiles = len(files)
         self.totalFilesProcessed += nFiles
-        nSuccess = nSkipped = nErrors = 0
         print(f"Found {nFiles} files.")
-
-        # Not sure if threads are useful but multi-process takes too long upfront for low counts.
-        with ProcessPoolExecutor() if nFiles > 25 else ThreadPoolExecutor() as pool:
-            # map seems to be a tiny bit faster maybe?
-            # chunksize seems to affect nothing, haven't tested >100 files tho
-            for result in pool.map(self.patchFile, files):
-                if result is None:
-                    nErrors += 1
-                elif result is False:
-                    nSkipped += 1
-                else:
-                    nSuccess += 1
+        files, nUnchanged = self.skipUnchanged(files)
+        tlHeaders = self.prepareRun(files)
+        (nSuccess, nSkipped, nErrors), stageTimes = self.runWorkers(files, tlHeaders)
+        nSkipped += nUnchanged
         self.totalFilesImported += nFiles
         print(
             f"Imported {nSuccess} files in {deltaTime(startTime)} seconds. "
-            f"Skipped: {nSkipped}, Errors: {nErrors} (Check import.log for details)"
+            f"Skipped: {nSkipped}, Errors: {nErrors}, "
+            f"Stages: {', '.join(f'{stage} {t:.1f}s' for stage, t in stageTimes.items())} "
+            "(Check import.log for details)"
         )
+        if self.bundleCache:
+            self.bundleCache.trim()
+        if commit and nErrors == 0 and self.isFullImport:
+            patch.setLastImport(self.args.type, self.args.dst, commit)
+
+    def skipUnchanged(self, files: list[Path]) -> tuple[list[Path], int]:
+        """With -U, drop files the import manifest shows as current.
+        Returns the rest and the number dropped."""
+        if not self.args.update:
+            return files, 0
+        unchanged = importmanifest.unchanged(files, self.args.dst, self.importOptions)
+        if unchanged:
+            files = [file for file in files if file not in unchanged]
+            print(f"{len(unchanged)} files unchanged since their last import.")
+        return files, len(unchanged)
+
+    def prepareRun(self, files: list[Path]) -> dict:
+        """Get shared state ready for the workers and download missing bundles.
+        Returns the files' translation headers."""
+        checksPatchStates = self.args.update or self.args.overwrite
+        if checksPatchStates and len(files) > PATCHSTATE_SCAN_MIN and not self.scannedPatchStates:
+            # Many patch state checks ahead, get them all at once.
+            patchstate.scan(self.args.dst)
+            self.scannedPatchStates = True
+        # Load before starting workers so they can use the snapshot.
+        MetaCatalog.get()
+        tlHeaders = tlindex.headers(self.args.type, files)
+        if not self.args.use_tlg:
+            restore.prefetch(self.requiredBundles(files, tlHeaders), self.restoreArgs)
+        return tlHeaders
+
+    def runWorkers(self, files: list[Path], tlHeaders: dict) -> tuple[tuple[int, int, int], dict[str, float]]:
+        """Import files on a worker pool sized to the work.
+        Returns (imported, skipped, errors) and the time spent in each pipeline stage."""
+        costs = self.estimateCosts(files, tlHeaders)
+        totalCost = sum(costs)
+        # Process startup only pays off with enough work to spread, threads avoid it for small runs.
+        useProcesses = totalCost >= PROCESS_POOL_MIN_COST
+        nWorkers = (os.cpu_count() or 1) if useProcesses else min(32, (os.cpu_count() or 1) + 4)
+        chunks = scheduleChunks(files, costs, nWorkers)
+        nWorkers = max(1, min(nWorkers, len(chunks)))
+        # Workers take chunks as they go, each ending at one of the None markers.
+        chunkQueue = multiprocessing.Queue() if useProcesses else SimpleQueue()
+        for chunk in chunks + [None] * nWorkers:
+            chunkQueue.put(chunk)
+        if useProcesses:
+            pool = ProcessPoolExecutor(nWorkers, initializer=_initWorker, initargs=(self, True, chunkQueue))
+        else:
+            pool = ThreadPoolExecutor(nWorkers, initializer=_initWorker, initargs=(self, False, chunkQueue))
+        # Per worker [imported, skipped, errors, busy time]
+        workerStats: dict[int, list] = dict()
+        stageTimes = {"read": 0.0, "patch": 0.0, "write": 0.0}
+        poolStart = now()
+        with pool:
+            tasks = [pool.submit(_runWorker) for _ in range(nWorkers)]
+            for worker, workerResults, duration, workerStageTimes in (task.result() for task in tasks):
+                stats = workerStats.setdefault(worker, [0, 0, 0, 0.0])
+                for result in workerResults:
+                    if result is None:
+                        stats[2] += 1
+                    elif result is False:
+                        stats[1] += 1
+                    else:
+                        stats[0] += 1
+                stats[3] += duration
+                for stage, t in workerStageTimes.items():
+                    stageTimes[stage] += t
+        poolTime = now() - poolStart
+        for worker, (imported, skipped, errors, busy) in sorted(workerStats.items()):
+            n = imported + skipped + errors
+            logger.info(
+                f"Worker {worker}: {n} files in {busy:.2f}s ({n / busy if busy else 0:.1f} files/s). "
+                f"Imported: {imported}, Skipped: {skipped}, Errors: {errors}"
+            )
+        if files:
+            busy = sum(stats[3] for stats in workerStats.values())
+            print(
+                f"Used {nWorkers} {'processes' if useProcesses else 'threads'} "
+                f"for {totalCost / 2**20:.1f} MiB of estimated work, "
+                f"utilization {busy / (poolTime * nWorkers) if poolTime else 0:.0%}."
+            )
+        totals = tuple(sum(stats[i] for stats in workerStats.values()) for i in range(3))
+        return totals, stageTimes
 
-    def patchFile(self, file: Path) -> bool:
-        isModified = False
+    @property
+    def isFullImport(self) -> bool:
+        """Whether all translation files of the type were imported.
+        Only such runs are a starting point for --changed last."""
+        args = self.args
+        if args.group or args.id or args.idx or args.skip_mtl:
+            return False
+        return not args.changed or args.changed == patch.CHANGED_SINCE_IMPORT
+
+    def requiredBundles(self, files: list[Path], tlHeaders: dict) -> list[GameBundle]:
+        """Return the game bundles the given translation files would be imported into."""
+        catalog = MetaCatalog.get()
+        bundles = list()
+        for file in files:
+            tlHeader = tlHeaders.get(file)
+            if tlHeader is None or (self.args.skip_mtl and not tlHeader.humanTl):
+                continue
+            meta = catalog.find(tlHeader.bundle)
+            if meta is not None:
+                bundles.append(
+                    GameBundle.fromName(meta.hash, load=False, bType=tlHeader.type, bundle_key=meta.key)
+                )
+        return bundles
+
+    def estimateCosts(self, files: list[Path], tlHeaders: dict) -> list[int]:
+        """Estimate the work of each file from its size plus its bundle's, in bytes."""
+        costs = list()
+        for file in files:
+            try:
+                cost = os.path.getsize(file)
+            except OSError:
+                cost = 0
+            if (tlHeader := tlHeaders.get(file)) and tlHeader.bundle:
+                try:
+                    cost += os.path.getsize(GameBundle.createPath(const.GAME_ASSET_ROOT, tlHeader.bundle))
+                except (OSError, TypeError):
+                    pass
+            costs.append(cost)
+        return costs
+
+    def report(self, file: Path, isModified: bool, reason) -> bool:
         try:
-            isModified, reason = self.patch(file)
             if isModified:
                 print(f"Imported {file} ({reason})")
             else:
                 logger.info(f"Skipped {file} ({reason})")
         except UnicodeError:
             print(f"Successfully processed file idx {file[:3]}, details unknown. (Could not render full name)")
-        except Exception:
-            logger.error(f"Error importing {file}", exc_info=True)
-            # raise PatchError(f"UnityPy error: {repr(e)}, skipping {tlFile.bundle}.")
-            isModified = None
         return isModified
 
-    def loadTranslationFile(self, path: Path):
+    def reportError(self, file: Path) -> None:
+        logger.error(f"Error importing {file}", exc_info=True)
+        # raise PatchError(f"UnityPy error: {repr(e)}, skipping {tlFile.bundle}.")
+        return None
+
+    def runPipeline(self, files: Iterable[Path]) -> tuple[list, dict[str, float]]:
+        """Import files with reading, patching and writing overlapping in separate stages.
+        The queues between them are bounded so only a few bundles are held in memory at once.
+        Returns the results in order and the time spent in each stage."""
+        stageTimes = {"read": 0.0, "patch": 0.0, "write": 0.0}
+        results = list()
+        toPatch, toWrite = Queue(PIPELINE_DEPTH), Queue(PIPELINE_DEPTH)
+        # Set when a stage is interrupted, so the others don't wait on it.
+        stop = Event()
+        threads = [
+            Thread(target=self._readStage, args=(files, toPatch, results, stageTimes, stop), daemon=True),
+            Thread(target=self._writeStage, args=(toWrite, results, stageTimes, stop), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._patchStage(toPatch, toWrite, results, stageTimes, stop)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+        return results, stageTimes
+
+    def _readStage(self, files: Iterable[Path], toPatch: Queue, results: list, stageTimes: dict, stop: Event):
+        try:
+            for file in files:
+                if stop.is_set():
+                    return
+                i = len(results)
+                results.append(None)
+                try:
+                    job = _timed(stageTimes, "read", self.prepare, file)
+                except Exception:
+                    job = self.reportError(file)
+                if not _put(toPatch, (i, file, job), stop):
+                    return
+        finally:
+            _put(toPatch, None, stop)
+
+    def _patchStage(self, toPatch: Queue, toWrite: Queue, results: list, stageTimes: dict, stop: Event):
+        try:
+            while (item := toPatch.get()) is not None:
+                i, file, job = item
+                if not isinstance(job, ImportJob):
+                    # Finished early, or failed when job is None.
+                    results[i] = job and self.report(file, *job)
+                    continue
+                try:
+                    result = _timed(stageTimes, "patch", self.patchBundle, job)
+                except Exception:
+                    results[i] = self.reportError(file)
+                    continue
+                if not _put(toWrite, (i, file, job, result), stop):
+                    return
+        finally:
+            _put(toWrite, None, stop)
+
+    def _writeStage(self, toWrite: Queue, results: list, stageTimes: dict, stop: Event):
+        try:
+            while (item := toWrite.get()) is not None:
+                i, file, job, result = item
+                try:
+                    _timed(stageTimes, "write", self.writeBundle, job)
+                    results[i] = self.report(file, *result)
+                except Exception:
+                    results[i] = self.reportError(file)
+        except BaseException:
+            stop.set()
+            raise
+
+    def loadTranslationFile(self, path: Path, headerOnly=False):
         try:
+            if headerOnly:
+                return TranslationFile.peek(path)
             return TranslationFile(path, readOnly=True)
         except Exception:
             raise TranslationFileError(f"Couldn't load translation data from {path}.")
 
-    def loadBundle(self, tlFile: TranslationFile):
-        mode = apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY
-        db = apsw.Connection(f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}", mode)
-        res = db.execute(f"SELECT e from a where h = '{tlFile.bundle}'").fetchone()
-        db.close()
-        if res is None:
+    def findBundle(self, tlFile: TranslationFile) -> GameBundle:
+        """Return the unloaded bundle to patch with tlFile, downloading it if missing."""
+        meta = MetaCatalog.get().find(tlFile.bundle)
+        if meta is None:
             logger.error(f"Couldn't find bundle key: {tlFile.bundle}")
-        bundle = GameBundle.fromName(tlFile.bundle, load=False, bType=tlFile.type, bundle_key=res[0])
+            raise NoAssetError(tlFile.bundle)
+        bundle = GameBundle.fromName(tlFile.bundle, load=False, bType=tlFile.type, bundle_key=meta.key)
         if not bundle.exists:
             logger.info(f"Asset {tlFile.bundle} doesn't exist, attempting download. (from {tlFile.name})")
             restore.save(bundle, self.restoreArgs) # should be synchronous
@@ -139,42 +356,171 @@ class PatchManager:
                 bundle.importState = "new"
         else:
             bundle.importState = "overwrite"
-        bundle.load()
-        bundle.linkedTlFile = tlFile
         return bundle
 
-    def patch(self, path: Path):
-        """Swaps game assets with translation file data, returns modified state."""
-        tlFile = self.loadTranslationFile(path)
-        if self.args.skip_mtl and not tlFile.data.get("humanTl"):
+    def fetchCached(self, cacheKey: str, tlFile: TranslationFile) -> bool:
+        """Copy the cached result of this import to dst if there is one, returns whether it was used."""
+        # Assets removed from the game or missing locally are left to findBundle, which reports them.
+        if MetaCatalog.get().find(tlFile.bundle) is None:
+            return False
+        if not GameBundle.fromName(tlFile.bundle, load=False).exists:
+            return False
+        dstBundle = GameBundle(GameBundle.createPath(self.args.dst, tlFile.bundle), load=False)
+        if self.args.update and dstBundle.isPatched:
+            return False  # Let findBundle decide if it's current.
+        if cacheKey not in self.bundleCache:
+            return False
+        if self.args.overwrite and dstBundle.exists and not dstBundle.isPatched:
+            backup.copy(dstBundle, self.fcArgs)
+        if not self.bundleCache.fetch(cacheKey, dstBundle.bundlePath):
+            return False
+        logger.debug(f"Copied cached {tlFile.bundle} ({cacheKey})")
+        return True
+
+    def prepare(self, path: Path):
+        """Read what's needed to patch a file, the I/O stage.
+        Returns an ImportJob, or the (modified, reason) result if there's nothing to patch."""
+        if self.args.skip_mtl and not self.loadTranslationFile(path, headerOnly=True).data.get("humanTl"):
             return False, "Skip MTL requested"
+        tlFile = self.loadTranslationFile(path)
         if self.args.use_tlg and isUsingTLG() and tlFile.data.get("tlg"):
             convertTlFile(tlFile)
             logger.info(f"Writing TLG version: {tlFile.name}")
             return False, "Prefer TLG version requested"
+        # Hashing reads the file again, only -U's manifest checks and the bundle cache need it.
+        tlHash = importmanifest.contentHash(path) if self.args.update or self.bundleCache else None
+        cacheKey = bundlecache.key(tlFile.bundle, tlHash, self.importOptions) if self.bundleCache else None
+        if cacheKey and self.fetchCached(cacheKey, tlFile):
+            importmanifest.put(path, self.args.dst, tlFile.bundle, self.importOptions, tlHash)
+            return True, "cached"
         try:
-            bundle = self.loadBundle(tlFile)
+            bundle = self.findBundle(tlFile)
         except PatchError as reason:
+            if isinstance(reason, AlreadyPatchedError):
+                importmanifest.put(path, self.args.dst, reason.bundle, self.importOptions, tlHash)
             return False, reason
-
-        if tlFile.type in ("story", "home"):
+        return ImportJob(path, tlFile, tlHash, cacheKey, bundle, bundle.read())
+
+    def patchBundle(self, job: "ImportJob"):
+        """Parse, patch and pack the bundle, the CPU stage. Returns (modified, reason)."""
+        bundle = job.bundle
+        bundle.load(job.raw)
+        job.raw = None
+        bundle.linkedTlFile = job.tlFile
+        if job.tlFile.type in ("story", "home"):
             patcher = StoryPatcher(self, bundle)
-        elif tlFile.type == "race":
+        elif job.tlFile.type == "race":
             patcher = RacePatcher(self, bundle)
-        elif tlFile.type == "preview":
+        elif job.tlFile.type == "preview":
             patcher = PreviewPatcher(self, bundle)
-        elif tlFile.type == "lyrics":
+        elif job.tlFile.type == "lyrics":
             patcher = LyricsPatcher(self, bundle)
 
         patcher.patch()
+        logger.debug(f"{bundle.bundleName}: {bundle.treeStatsSummary()}")
         if patcher.isModified:
-            if self.args.overwrite and not bundle.isPatched:
-                backup.copy(bundle, self.fcArgs)
-            bundle.markPatched(tlFile)
-            bundle.save(dstFolder=self.args.dst)
-
+            # Only results of patching the original are cached, already patched sources may differ.
+            job.fromOriginal = not bundle.isPatched
+            bundle.markPatched(job.tlFile)
+            job.packed = bundle.pack()
         return patcher.isModified, bundle.importState
 
+    def writeBundle(self, job: "ImportJob"):
+        """Back up the original and write the patched bundle, the output stage."""
+        if job.packed is None:
+            return
+        bundle = job.bundle
+        if self.args.overwrite and job.fromOriginal:
+            backup.copy(bundle, self.fcArgs)
+        out = bundle.write(job.packed, dstFolder=self.args.dst)
+        job.packed = None
+        importmanifest.put(job.path, self.args.dst, bundle.bundleName, self.importOptions, job.tlHash)
+        if job.cacheKey and job.fromOriginal:
+            self.bundleCache.put(job.cacheKey, out)
+
+
+class ImportJob:
+    """A file's state between the import stages."""
+
+    def __init__(
+        self, path: Path, tlFile: TranslationFile, tlHash: str, cacheKey: str, bundle: GameBundle, raw
+    ) -> None:
+        self.path = path
+        self.tlFile = tlFile
+        self.tlHash = tlHash
+        self.cacheKey = cacheKey
+        self.bundle = bundle
+        self.raw = raw
+        self.fromOriginal = False
+        self.packed: bytes = None
+
+
+_MANAGER: PatchManager = None
+_CHUNKS: SimpleQueue = None
+
+
+def _initWorker(manager: PatchManager, isProcess: bool, chunks: SimpleQueue):
+    """Set up per-process state once so tasks only carry file paths."""
+    global _MANAGER, _CHUNKS
+    _MANAGER = manager
+    _CHUNKS = chunks
+    if isProcess:
+        logger.levelFromArgs(manager.args)
+    MetaCatalog.get()
+
+
+def _timed(stageTimes: dict, stage: str, func, *args):
+    startTime = now()
+    try:
+        return func(*args)
+    finally:
+        stageTimes[stage] += now() - startTime
+
+
+def _put(queue: Queue, item, stop: Event) -> bool:
+    """Put item on a bounded queue, unless the pipeline is stopped as its consumer may be gone.
+    Returns whether it was put."""
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _queuedFiles():
+    while (chunk := _CHUNKS.get()) is not None:
+        yield from chunk
+
+
+def _runWorker() -> tuple:
+    """Patch queued chunks in a single pipeline until the queue's end marker.
+    Returns (worker id, results, duration, stage times)."""
+    startTime = now()
+    results, stageTimes = _MANAGER.runPipeline(_queuedFiles())
+    # Native thread ids tell pool threads apart, a process' main thread has its pid.
+    return get_native_id(), results, now() - startTime, stageTimes
+
+
+def scheduleChunks(files: list[Path], costs: list[int], nWorkers: int) -> list[list[Path]]:
+    """Group files into chunks of similar estimated cost, biggest first.
+    Big files get chunks of their own and start early so none is left running alone at the end,
+    small ones are batched to save round trips."""
+    order = sorted(range(len(files)), key=costs.__getitem__, reverse=True)
+    target = sum(costs) / (nWorkers * 16)
+    chunks = list()
+    chunk, chunkCost = list(), 0
+    for i in order:
+        chunk.append(files[i])
+        chunkCost += costs[i]
+        if chunkCost >= target:
+            chunks.append(chunk)
+            chunk, chunkCost = list(), 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
 
 class StoryPatcher:
     def __init__(self, manager: PatchManager, bundle: GameBundle) -> None:
@@ -182,7 +528,7 @@ class StoryPatcher:
         self.skipped = 0
         self.totalBlocks = len(bundle.linkedTlFile.textBlocks)
         self.bundle = bundle
-        self.assetData = bundle.rootAsset.read_typetree()
+        self.assetData = bundle.rootData
 
     def _adjustCLipLength(self, assetData:dict, textBlock:dict, blockIdx:int):
         # Calculate length
@@ -222,13 +568,12 @@ class StoryPatcher:
                 if newAnimLen <= animGroup["origLen"]:
                     logger.debug(f"{blockIdx}: New anim data <= original. Skipping.")
                     break
-                animAsset = self.bundle.assets.get(animGroup["pathId"])
-                if animAsset is None:
+                animData = self.bundle.getAssetData(animGroup["pathId"])
+                if animData is None:
                     logger.debug(f"{blockIdx}: Can't find animation asset ({animGroup['pathId']})")
                     break
-                animData = animAsset.read_typetree()
                 animData["ClipLength"] = newAnimLen
-                animAsset.save_typetree(animData)
+                self.bundle.setAssetData(animGroup["pathId"], animData)
                 logger.debug(f"{blockIdx}: Adjusted AnimClip length: {animGroup['origLen']} -> {newAnimLen}")
         else:
             logger.debug(f"{blockIdx}: Text length adjusted but no anim data found")
@@ -239,25 +584,22 @@ class StoryPatcher:
             if not track['ClipList']:
                 continue
             clipPathID = track['ClipList'][-1]['m_PathID']
-            try:
-                clipAsset = self.bundle.assets[clipPathID]
-            except KeyError:
+            clipData = self.bundle.getAssetData(clipPathID)
+            if clipData is None:
                 logger.debug(f"Can't find screen effect clip asset ({clipPathID}) at {blockIdx}")
                 continue
-            clipData = clipAsset.read_typetree()
             if clipData['StartFrame'] + clipData['ClipLength'] < assetData["StartFrame"] + origClipLen:
                 continue
             curClipLen = clipData['ClipLength']
             clipData["ClipLength"] = max(newClipLen, clipData['ClipLength'])
-            clipAsset.save_typetree(clipData)
+            self.bundle.setAssetData(clipPathID, clipData)
             logger.debug(f"Adjusted ScreenEffectClip length at {blockIdx}: {curClipLen} -> {clipData['ClipLength']}")
 
     def patch(self):
         logger.debug(f"Patching {self.bundle.bundleName}")
         for textBlock in self.bundle.linkedTlFile.textBlocks:
             blockIdx = textBlock["blockIdx"]
-            asset = self.bundle.assets.get(textBlock["pathId"])
-            if asset is None:
+            if textBlock["pathId"] not in self.bundle.assets:
                 logger.warning(f"{blockIdx}: Can't find path id, skipping.")
                 # ?: is there a reason we didn't skip here? untested!
                 self.skipped += 1
@@ -267,7 +609,7 @@ class StoryPatcher:
                 self.skipped += 1
                 continue
 
-            assetData = asset.read_typetree()
+            assetData = self.bundle.getAssetData(textBlock["pathId"])
             assetData["Text"] = textBlock["enText"] or assetData["Text"]
             assetData["Name"] = textBlock["enName"] or assetData["Name"]
 
@@ -290,7 +632,7 @@ class StoryPatcher:
                     for idx, text in enumerate(enColored):
                         if enText := text["enText"]:
                             jpColored[idx]["Text"] = enText
-            asset.save_typetree(assetData)
+            self.bundle.setAssetData(textBlock["pathId"], assetData)
 
         try:
             self.assetData["TypewriteCountPerSecond"] = self.manager.args.fps * 3
@@ -305,7 +647,7 @@ class StoryPatcher:
 
     def save(self):
         if self.isModified:
-            self.bundle.rootAsset.save_typetree(self.assetData)
+            self.bundle.setAssetData(self.bundle.rootAsset.path_id, self.assetData)
 
     @property
     def isModified(self):
@@ -406,6 +748,12 @@ def parseArgs(args=None):
     ap.add_argument(
         "-nomtl", "--skip-mtl", action="store_true", help="Only import human translations"
     )
+    ap.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Keep patched bundles here, copied instead of patching again when the inputs are unchanged",
+    )
+    ap.add_argument("--cache-max-gb", default=10.0, type=float, help="Size limit of the --cache-dir cache")
     return ap.parse_args(args)
 
 
@@ -427,6 +775,7 @@ def main(args: patch.Args = None):
                 patcher.config(type=type)
                 patcher.start()
             print(f"Updated a total of {patcher.totalFilesImported} files in {deltaTime(startTime)}")
+        print(MetaCatalog.summary())
     finally:
         logger.closeFile()
 
@@ -27,13 +27,21 @@ class DataTransfer:
 
         if textSearch:
             logger.debug("Searching by text")
-            for i, block in enumerate(textBlocks):
-                if similarity(block["jpText"], textData["jpText"]) > self.simRatio:
-                    logger.debug(f"Found text at block {i}")
-                    self.offset = txtIdx - i
-                    targetBlock = block
-                    break
-            if not targetBlock:
+            # Exact matches are an index lookup but only useful when they're translated.
+            i = textBlocks.findIdx("jpText", textData["jpText"], near=txtIdx)
+            if i is None or not textBlocks[i].get("enText"):
+                i = next(
+                    (
+                        i for i, block in enumerate(textBlocks)
+                        if similarity(block["jpText"], textData["jpText"]) > self.simRatio
+                    ),
+                    None,
+                )
+            if i is not None:
+                logger.debug(f"Found text at block {i}")
+                self.offset = txtIdx - i
+                targetBlock = textBlocks[i]
+            else:
                 logger.info(f"At bIdx/time {textData.get('blockIdx', textData.get('time', 'no_idx'))}: jpText not found in file.")
 
         if targetBlock:
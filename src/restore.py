@@ -1,13 +1,15 @@
+import os
 import shutil
-import apsw
 from argparse import SUPPRESS
 from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from os.path import isfile, join, realpath
-
-import requests
+from threading import BoundedSemaphore, Lock, local
+from time import sleep
+from urllib.parse import urlsplit
 
 import common.constants as const
-from common import patch, logger
+from common import patch, patchstate, tlindex, logger
 from common.types import TranslationFile, GameBundle
 
 HOSTNAME = "https://prd-storage-game-umamusume.akamaized.net/dl/resources"
@@ -15,21 +17,144 @@ GENERIC_ENDPOINT = HOSTNAME + "/Generic/{0:.2}/{0}"
 ASSET_ENDPOINT = HOSTNAME + "/Windows/assetbundles/{0:.2}/{0}"
 MANIFEST_ENDPOINT = HOSTNAME + "/Manifest/{0:.2}/{0}"
 
-META_DB = apsw.Connection(f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}", apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY)
-SESSION = None
+META_DB = None
+PREFETCH_WORKERS = 8
+MAX_HOST_CONNECTIONS = 16
+RETRIES = 3
+RETRY_STATUS = (429, 500, 502, 503, 504)
+TIMEOUT = (10, 60)  # connect, read
+CHUNK_SIZE = 1 << 16
+
+_LOCAL = local()
+_SESSIONS = list()
+_HOST_SLOTS: dict[str, BoundedSemaphore] = dict()
+_LOCK = Lock()
+# Worker processes collect downloaded bundle names here for the parent to mark in META_DB.
+DEFERRED_META_UPDATES: list[str] = None
+
+
+def metaDb():
+    """Return the meta DB connection, opened on first use."""
+    global META_DB
+    if META_DB is None:
+        import apsw
+
+        META_DB = apsw.Connection(
+            f"file:{str(const.GAME_META_FILE)}?hexkey={const.DB_KEY}",
+            apsw.SQLITE_OPEN_URI | apsw.SQLITE_OPEN_READONLY,
+        )
+    return META_DB
+
+
+def closeMetaDb():
+    global META_DB
+    if META_DB is not None:
+        META_DB.close()
+        META_DB = None
+
+
+def markDownloaded(bundleName: str):
+    if DEFERRED_META_UPDATES is not None:
+        DEFERRED_META_UPDATES.append(bundleName)
+        return
+    try:
+        metaDb().execute(f"UPDATE a SET s = 1 WHERE h = '{bundleName}';")
+    except Exception:
+        pass
+
+
+def session():
+    """Return this thread's HTTP session, created on first use.
+    Sessions aren't safe to share between threads."""
+    s = getattr(_LOCAL, "session", None)
+    if s is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        # No retries here, download() retries and resumes itself.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        s = _LOCAL.session = requests.Session()
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        with _LOCK:
+            _SESSIONS.append(s)
+    return s
+
+
+def closeSessions():
+    with _LOCK:
+        for s in _SESSIONS:
+            s.close()
+        _SESSIONS.clear()
+
+
+@contextmanager
+def _hostSlot(url: str):
+    """Limit concurrent connections per host across all threads."""
+    host = urlsplit(url).netloc
+    with _LOCK:
+        slots = _HOST_SLOTS.get(host)
+        if slots is None:
+            slots = _HOST_SLOTS[host] = BoundedSemaphore(MAX_HOST_CONNECTIONS)
+    with slots:
+        yield
 
-def download(file, t: str = "story"):
-    global SESSION
-    if SESSION is None:
-        SESSION = requests.Session()
+
+def getUrl(file, t: str = "story") -> str:
     if t in ("sound", "movie", "font"):
-        url = GENERIC_ENDPOINT.format(file)
+        return GENERIC_ENDPOINT.format(file)
     elif t.startswith("manifest"):
-        url = MANIFEST_ENDPOINT.format(file)
+        return MANIFEST_ENDPOINT.format(file)
     else:
-        url = ASSET_ENDPOINT.format(file)
+        return ASSET_ENDPOINT.format(file)
+
+
+def download(file, t: str = "story", dst=None, resume=True) -> bool:
+    """Stream a file from the CDN to dst (default: the file name).
+    Data goes to a .part file that's renamed when complete.
+    Responses with server errors are retried with backoff, broken transfers resume where they stopped."""
+    import requests
+
+    url = getUrl(file, t)
+    dst = dst or file
+    part = f"{dst}.part"
     logger.conditionalDetail(f"Downloading {file}", f"Downloading {file} from {url}", logger.INFO)
-    return SESSION.get(url)
+    with _hostSlot(url):
+        for attempt in range(RETRIES + 1):
+            # Files are named by content hash so a leftover part is always from the same file.
+            offset = os.path.getsize(part) if resume and isfile(part) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else None
+            try:
+                with session().get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                    if r.status_code == 416:  # Part is complete or invalid, start over.
+                        with suppress(FileNotFoundError):
+                            os.remove(part)
+                        continue
+                    if r.status_code in RETRY_STATUS:
+                        r.raise_for_status()
+                    if r.status_code not in (200, 206):
+                        logger.error(f"Error downloading file {file}")
+                        logger.debug(f"Status: {r.status_code}\nContent:{r.text}")
+                        return False
+                    with open(part, "ab" if r.status_code == 206 else "wb") as f:
+                        for chunk in r.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                os.replace(part, dst)
+                return True
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+                requests.HTTPError,
+            ) as e:
+                logger.debug(
+                    f"Download of {file} failed ({repr(e)}), attempt {attempt + 1}/{RETRIES + 1}"
+                )
+                if not resume and isfile(part):
+                    os.remove(part)
+                sleep(0.5 * 2**attempt)
+    logger.error(f"Error downloading file {file}: retries exhausted")
+    return False
 
 
 def save(bundle: GameBundle, args):
@@ -43,27 +168,54 @@ def save(bundle: GameBundle, args):
         )
         shutil.copyfile(localFile, bundle.bundlePath)
     else:
-        data = download(bundle.bundleName, bundle.bundleType)
-        if data.status_code == 200:
-            with open(bundle.bundlePath, "wb") as f:
-                f.write(data.content)
-            try:
-                META_DB.execute(f"UPDATE a SET s = 1 WHERE h = '{bundle.bundleName}';")
-            except Exception:
-                pass
-        else:
-            logger.error(f"Error downloading file {bundle.bundleName}")
-            logger.debug(f"Status: {data.status_code}\nContent:{data.text}")
+        if not download(bundle.bundleName, bundle.bundleType, bundle.bundlePath):
             return 0
+        markDownloaded(bundle.bundleName)
     return 1
 
 
+def existing(bundles: list[GameBundle]) -> set[str]:
+    """Return the names of the given bundles that exist, listing each of their dirs once."""
+    found = set()
+    for folder in {bundle.bundlePath.parent for bundle in bundles}:
+        try:
+            with os.scandir(folder) as entries:
+                found.update(entry.name for entry in entries)
+        except FileNotFoundError:
+            pass
+    return found
+
+
+def prefetch(bundles: list[GameBundle], args, workers: int = PREFETCH_WORKERS) -> int:
+    """Fetch the missing bundles concurrently, ahead of the work that needs them.
+    Returns the number fetched."""
+    found = existing(bundles)
+    missing = {bundle.bundleName: bundle for bundle in bundles if bundle.bundleName not in found}
+    if not missing:
+        return 0
+    print(f"Fetching {len(missing)} missing bundles...")
+
+    def fetch(bundle: GameBundle):
+        try:
+            os.makedirs(bundle.bundlePath.parent, exist_ok=True)
+            return save(bundle, args)
+        except Exception as e:
+            logger.error(f"Error fetching {bundle.bundleName}: {repr(e)}")
+            return 0
+
+    with ThreadPoolExecutor(workers) as pool:
+        fetched = sum(pool.map(fetch, missing.values()))
+    closeSessions()
+    logger.info(f"Fetched {fetched}/{len(missing)} missing bundles.")
+    return fetched
+
+
 def restore(file, args):
     if args.src:
         bundle = GameBundle.fromName(args.src, load=False, bType=args.srctype)
     else:
         try:
-            file = TranslationFile(file, readOnly=True)
+            file = tlindex.header(file) or TranslationFile.peek(file)
         except:
             logger.error(f"Error in file: {file}")
             return 0
@@ -100,11 +252,13 @@ def parseArgs(args=None):
 
 def main(args: patch.Args = None):
     args = args or parseArgs(args)
-    META_DB.execute("BEGIN")
+    metaDb().execute("BEGIN")
     try:
         if args.src:
             restore(args.src, args)
         else:
+            if args.uninstall:
+                patchstate.scan(const.GAME_ASSET_ROOT)
             processed = 0
 
             def update(f: Future):
@@ -118,10 +272,9 @@ def main(args: patch.Args = None):
                         pool.submit(restore, file, args).add_done_callback(update)
             print(f"Restored {processed} files.")
     finally:
-        if SESSION:
-            SESSION.close()
-        META_DB.execute("COMMIT")
-        META_DB.close()
+        closeSessions()
+        metaDb().execute("COMMIT")
+        closeMetaDb()
 
     if args.uninstall:
         from common.utils import getUmaInstallDir
@@ -0,0 +1,262 @@
+"""Benchmarks for the hot paths of the scripts. Numbers vary by machine, compare runs on the same one.
+Run from the repo root: python src/scripts/benchmark.py <benchmark> [-h]"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+def timeIt(func, *args, runs=3):
+    """Return the fastest of runs calls to func, in seconds."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchXor(args):
+    """Bundle decryption speed, against the original per-byte loop on the smallest size."""
+    from common.types import GameBundle, _finalKey
+
+    bundle = GameBundle("bench", load=False, bundle_key=args.key)
+    key = _finalKey(args.key)
+
+    def byteLoop(buf):
+        for i in range(256, len(buf)):
+            buf[i] ^= key[i % len(key)]
+
+    for mb in args.sizes:
+        buf = bytearray(os.urandom(mb << 20))
+        reference = ""
+        if mb == min(args.sizes):
+            expected = bytearray(buf)
+            bundle._crypt(expected)
+            reference = f", byte loop {mb / timeIt(byteLoop, buf, runs=1):.0f} MB/s"
+            assert buf == expected, "XOR result differs from the byte loop"
+        print(f"{mb:>4} MB: {mb / timeIt(bundle._crypt, buf):8.0f} MB/s{reference}")
+
+
+def benchJson(args):
+    """readJson/writeJson throughput over translation files, with the stdlib and with orjson."""
+    import tempfile
+
+    from common import utils
+
+    files = sorted(Path(args.src).rglob("*.json"))[: args.limit]
+    data = [utils.readJson(f) for f in files]
+    mb = sum(f.stat().st_size for f in files) / (1 << 20)
+    print(f"{len(files)} files, {mb:.0f} MB")
+    backends = {"stdlib": None}
+    if utils.orjson:
+        backends["orjson"] = utils.orjson
+    else:
+        print("orjson isn't installed, only timing the stdlib.")
+    outputs = dict()
+    with tempfile.TemporaryDirectory() as tmp:
+        outPaths = [Path(tmp) / f"{i}.json" for i in range(len(files))]
+        for name, backend in backends.items():
+            utils.orjson = backend
+            readTime = timeIt(lambda: [utils.readJson(f) for f in files])
+            writeTime = timeIt(lambda: [utils.writeJson(p, d) for p, d in zip(outPaths, data)])
+            outputs[name] = [p.read_bytes() for p in outPaths]
+            print(f"{name}: read {readTime:.2f}s ({mb / readTime:.0f} MB/s), write {writeTime:.2f}s")
+        utils.orjson = backends.get("orjson")
+    if len(outputs) > 1:
+        diffs = sum(a != b for a, b in zip(*outputs.values()))
+        print(f"{diffs} files written differently")
+
+
+# name: (removed, inserted, edited) block fractions, blocks prepended, keep blockIdx
+ALIGN_CASES = {
+    "shifted": ((0.08, 0.08, 0.06), 0, True),
+    "prepended": ((0, 0, 0.34), 5, True),
+    "no blockIdx": ((0.08, 0.08, 0.06), 0, False),
+}
+
+
+def mutateBlocks(textBlocks, rng, fractions, prepend, keepIdx):
+    """Simulate a game update. Returns the new blocks without translations and the expected ones."""
+    removed, inserted, edited = fractions
+    new = [({"jpText": f"追加{rng.random()}"}, None) for _ in range(prepend)]
+    for block in textBlocks:
+        r = rng.random()
+        if r < removed:
+            continue
+        if r < removed + inserted:
+            new.append(({"jpText": f"追加{rng.random()}"}, None))
+        block = {"jpText": block["jpText"], "enText": block["enText"]}
+        if removed + inserted <= r < removed + inserted + edited:
+            block["jpText"] += "…"
+        new.append((block, block["enText"]))
+    texts = []
+    for i, (block, _) in enumerate(new, start=1):
+        block["enText"] = ""
+        if keepIdx:
+            block["blockIdx"] = i
+        texts.append(block)
+    return texts, [expected for _, expected in new]
+
+
+def benchAlign(args):
+    """Translation transfer when re-extracting, on the largest story files with simulated updates."""
+    import random
+
+    import extract
+    from common import logger
+    from common.types import TranslationFile
+
+    logger.setConsoleLevel(logger.CRITICAL)
+    files = sorted(Path(args.src).rglob("*.json"), key=lambda f: f.stat().st_size)[-args.files :]
+    for name, (fractions, prepend, keepIdx) in ALIGN_CASES.items():
+        extract.args = argparse.Namespace(
+            overwrite=True, update=True, upgrade=False, type="story" if keepIdx else "lyrics"
+        )
+        rng = random.Random(1)
+        total = correct = wrong = 0
+        elapsed = 0
+        for file in files:
+            tlFile = TranslationFile(file)
+            texts, expected = mutateBlocks(tlFile.textBlocks, rng, fractions, prepend, keepIdx)
+            start = time.perf_counter()
+            extract.DataTransfer(tlFile)(None, texts)
+            elapsed += time.perf_counter() - start
+            for textData, enText in zip(texts, expected):
+                total += bool(enText)
+                correct += bool(enText) and textData["enText"] == enText
+                wrong += bool(textData["enText"]) and textData["enText"] != enText
+        print(f"{name}: {elapsed:.3f}s, {correct}/{total} transferred, {wrong} wrong")
+
+
+def serveFiles(folder: Path, latency: float, failRate: float):
+    """Serve folder over HTTP on localhost, with Range support. failRate of requests get a 503 and as many
+    again have their body cut off halfway. Returns the server and the list of Range headers received."""
+    import random
+    import threading
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    ranges = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(folder), **kwargs)
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, body=b"", headers=()):
+            self.send_response(status)
+            for header in headers:
+                self.send_header(*header)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if random.random() < failRate:
+                self.wfile.write(body[: len(body) // 2])
+                self.close_connection = True
+            else:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(latency)
+            if random.random() < failRate:
+                return self.reply(503)
+            data = Path(self.translate_path(self.path)).read_bytes()
+            start = 0
+            if rng := self.headers.get("Range"):
+                ranges.append(rng)
+                start = int(rng.split("=")[1].rstrip("-"))
+                if start >= len(data):
+                    return self.reply(416)
+            headers = [("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")] if start else []
+            self.reply(206 if rng else 200, data[start:], headers)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, ranges
+
+
+def benchDownload(args):
+    """restore.download throughput and memory against a local server, optionally a flaky one."""
+    import io
+    import random
+    import tempfile
+    import tracemalloc
+    from concurrent.futures import ThreadPoolExecutor
+    from contextlib import redirect_stdout
+
+    import restore
+    from common import logger
+
+    logger.setConsoleLevel(logger.CRITICAL)
+    random.seed(1)
+    names = [f"{i:02x}{'ab' * 15}{i:04d}" for i in range(args.files)]
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as dst:
+        for name in names:
+            path = Path(src, name[:2], name)
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(os.urandom(args.size << 20))
+        server, ranges = serveFiles(Path(src), args.latency / 1000, args.fail_rate)
+        restore.ASSET_ENDPOINT = f"http://127.0.0.1:{server.server_port}" + "/{0:.2}/{0}"
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        # download() prints progress.
+        with ThreadPoolExecutor(args.threads) as pool, redirect_stdout(io.StringIO()):
+            nSaved = sum(pool.map(lambda name: restore.download(name, dst=Path(dst, name)), names))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        restore.closeSessions()
+        server.shutdown()
+
+        verified = 0
+        for name in names:
+            out = Path(dst, name)
+            verified += out.is_file() and out.read_bytes() == Path(src, name[:2], name).read_bytes()
+    mb = args.files * args.size
+    print(
+        f"{nSaved}/{len(names)} saved, {verified} verified, {elapsed:.2f}s ({mb / elapsed:.0f} MB/s), "
+        f"{peak / (1 << 20):.0f} MB peak traced memory, {len(ranges)} resumed"
+    )
+
+
+BENCHMARKS = {
+    "xor": benchXor,
+    "json": benchJson,
+    "align": benchAlign,
+    "download": benchDownload,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="benchmark", required=True)
+    xor = sub.add_parser("xor", help=benchXor.__doc__)
+    xor.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50], help="Buffer sizes in MB")
+    xor.add_argument("--key", type=int, default=-987654321, help="Bundle key")
+    json = sub.add_parser("json", help=benchJson.__doc__)
+    json.add_argument("--src", default=ROOT / "translations", help="Folder of JSON files")
+    json.add_argument("--limit", type=int, help="Max number of files")
+    align = sub.add_parser("align", help=benchAlign.__doc__)
+    align.add_argument("--src", default=ROOT / "translations" / "story", help="Folder of story files")
+    align.add_argument("--files", type=int, default=40, help="Number of files, the largest are used")
+    download = sub.add_parser("download", help=benchDownload.__doc__)
+    download.add_argument("--files", type=int, default=96, help="Number of files")
+    download.add_argument("--size", type=int, default=4, help="File size in MB")
+    download.add_argument("--threads", type=int, default=8, help="Download threads")
+    download.add_argument("--latency", type=float, default=20, help="Server latency in ms")
+    download.add_argument("--fail-rate", type=float, default=0, help="Share of failed requests")
+    args = ap.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
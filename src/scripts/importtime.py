@@ -0,0 +1,91 @@
+"""Check the startup cost of the CLI entry points with python -X importtime.
+Fails if an entry point imports a heavy dependency up front or takes longer than the budget to import.
+Run from the repo root: python src/scripts/importtime.py"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+# The editor and the installer need their heavy imports right away, they're left out.
+ENTRY_POINTS = (
+    "src/import.py",
+    "src/extract.py",
+    "src/restore.py",
+    "src/manage.py",
+    "src/names.py",
+    "src/filecopy.py",
+    "src/textprocess.py",
+    "src/ruby-remover.py",
+    "src/machinetl.py",
+    "src/subtransfer.py",
+    "src/mdb/import.py",
+    "src/mdb/extract.py",
+    "src/mdb/transfer.py",
+)
+# Dependencies that must only be imported when used.
+HEAVY = ("UnityPy", "regex", "requests", "apsw")
+BUDGET_MS = 100
+# Import the script as a module, with sys.path set up as when it's run.
+IMPORT_CODE = (
+    "import os, sys; path = sys.argv[1]; sys.path.insert(0, os.path.dirname(path)); "
+    "__import__(os.path.splitext(os.path.basename(path))[0])"
+)
+
+
+def measure(entryPoint: str):
+    """Import entryPoint in a fresh interpreter. Returns (ms, heavy modules loaded) or the error."""
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_CODE, entryPoint],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if res.returncode != 0:
+        return res.stderr.strip().splitlines()[-1]
+    name = os.path.splitext(os.path.basename(entryPoint))[0]
+    ms = 0
+    heavy = set()
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line.split("|")
+        package = module.strip().split(".")[0]
+        if package in HEAVY:
+            heavy.add(package)
+        if module.rstrip() == f" {name}":
+            ms = int(cumulative) / 1000
+    return ms, heavy
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budget", type=float, default=BUDGET_MS, help="Max import time per entry point, in ms")
+    ap.add_argument("--runs", type=int, default=3, help="Imports per entry point, the fastest counts")
+    args = ap.parse_args()
+
+    failed = False
+    for entryPoint in ENTRY_POINTS:
+        results = [measure(entryPoint) for _ in range(args.runs)]
+        errors = [r for r in results if isinstance(r, str)]
+        if errors:
+            # Optional dependencies of a script may not be installed.
+            status = "SKIP" if "ModuleNotFoundError" in errors[0] else "FAIL"
+            failed |= status == "FAIL"
+            print(f"{status} {entryPoint}: {errors[0]}")
+            continue
+        ms = min(r[0] for r in results)
+        heavy = set().union(*(r[1] for r in results))
+        ok = ms <= args.budget and not heavy
+        failed |= not ok
+        print(
+            f"{'OK  ' if ok else 'FAIL'} {entryPoint}: {ms:.1f}ms"
+            + (f", imports {', '.join(sorted(heavy))}" if heavy else "")
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
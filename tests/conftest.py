@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scripts import common as a top-level package, like when they're run from src/.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
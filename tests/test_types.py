@@ -0,0 +1,86 @@
+from common import utils
+from common.types import TranslationFile
+
+
+def makeFile(tmp_path, blocks=None):
+    path = tmp_path / "tl.json"
+    blocks = [{"jpText": "あ", "enText": "a", "blockIdx": 1}] if blocks is None else blocks
+    utils.writeJson(path, {"version": 6, "type": "story", "bundle": "x", "storyId": "1", "text": blocks})
+    return TranslationFile(path)
+
+
+def test_loadedFileIsUnmodified(tmp_path):
+    tlFile = makeFile(tmp_path)
+    assert not tlFile.isModified
+    tlFile.textBlocks[0]["enText"] = "a"
+    assert not tlFile.isModified
+    tlFile.textBlocks[0]["enText"] = "b"
+    assert tlFile.isModified
+
+
+def test_assignedContainersKeepIdentity(tmp_path):
+    tlFile = makeFile(tmp_path)
+    block = tlFile.textBlocks[0]
+    choices = []
+    block["choices"] = choices
+    choices.append({"jpText": "い", "enText": ""})
+    newBlock = {"jpText": "う"}
+    tlFile.textBlocks.data.append(newBlock)
+    newBlock["enText"] = "u"
+    tlFile.textBlocks.data[0] = block
+    tlFile.save()
+
+    saved = utils.readJson(tlFile.file)["text"]
+    assert saved[0]["choices"] == [{"jpText": "い", "enText": ""}]
+    assert saved[1] == {"jpText": "う", "enText": "u"}
+
+
+def test_changesToAssignedContainersAfterSave(tmp_path):
+    tlFile = makeFile(tmp_path)
+    choices = []
+    tlFile.textBlocks[0]["choices"] = choices
+    tlFile.save()
+    assert not tlFile.isModified
+    choices.append({"jpText": "い", "enText": ""})
+    assert tlFile.isModified
+    tlFile.save()
+    assert utils.readJson(tlFile.file)["text"][0]["choices"] == [{"jpText": "い", "enText": ""}]
+    assert not tlFile.isModified
+
+
+def test_reloadRestoresTracking(tmp_path):
+    tlFile = makeFile(tmp_path)
+    tlFile.textBlocks[0]["choices"] = []
+    tlFile.save()
+    tlFile.reload()
+    assert tlFile._snapshot is None
+    tlFile.textBlocks[0]["choices"].append({"jpText": "い"})
+    assert tlFile.isModified
+
+
+def test_textBlocksSetterKeepsList(tmp_path):
+    tlFile = makeFile(tmp_path)
+    blocks = []
+    tlFile.textBlocks = blocks
+    blocks.append({"jpText": "え", "enText": "e"})
+    tlFile.save()
+    assert utils.readJson(tlFile.file)["text"] == [{"jpText": "え", "enText": "e"}]
+
+
+def test_findAfterChange(tmp_path):
+    blocks = [{"jpText": "あ", "enText": "a", "blockIdx": 1}, {"jpText": "い", "enText": "i", "blockIdx": 2}]
+    makeFile(tmp_path, blocks)
+    path = tmp_path / "tl.json"
+    for tlFile in (TranslationFile(path), TranslationFile(path, readOnly=True)):
+        textBlocks = tlFile.textBlocks
+        assert textBlocks.find("jpText", "あ")["blockIdx"] == 1
+        textBlocks[0]["jpText"] = "う"
+        assert textBlocks.find("jpText", "あ") is None
+        assert textBlocks.findIdx("jpText", "う") == 0
+
+    tlFile = TranslationFile(path)
+    block = {"jpText": "え"}
+    tlFile.textBlocks.data.append(block)
+    assert tlFile.textBlocks.findIdx("jpText", "え") == 2
+    block["jpText"] = "お"
+    assert tlFile.textBlocks.findIdx("jpText", "え") is None
@@ -0,0 +1,50 @@
+import pytest
+
+from common import utils
+
+HEADER = {"version": 6, "bundle": "abc", "type": "story", "storyId": "040001001"}
+
+
+def textBlocks(n):
+    return [{"jpText": f"テキスト{i}", "enText": f"Text {i}", "nextBlock": i + 1} for i in range(n)]
+
+
+def peekMatchesFullRead(path, fast=True, monkeypatch=None):
+    expected = utils.readJson(path)
+    expected.pop("text")
+    if fast:
+        # The fast path must not need the full read.
+        monkeypatch.setattr(utils, "readJson", pytest.fail)
+    assert utils.peekJson(path) == expected
+
+
+@pytest.mark.parametrize("trailing", [{}, {"modified": 1700000000, "humanTl": True, "tags": ["a", "b"]}])
+def test_peekLargeText(tmp_path, monkeypatch, trailing):
+    path = tmp_path / "tl.json"
+    utils.writeJson(path, {**HEADER, "text": textBlocks(2000), **trailing})
+    peekMatchesFullRead(path, monkeypatch=monkeypatch)
+
+
+def test_peekSmallText(tmp_path):
+    path = tmp_path / "tl.json"
+    utils.writeJson(path, {**HEADER, "title": "x" * 5000, "text": textBlocks(2), "modified": 1})
+    peekMatchesFullRead(path, fast=False)
+
+
+def test_peekHeaderPastHead(tmp_path):
+    path = tmp_path / "tl.json"
+    utils.writeJson(path, {**HEADER, "notes": "x" * 5000, "text": textBlocks(2000), "modified": 1})
+    peekMatchesFullRead(path, fast=False)
+
+
+def test_peekTrailingPastTail(tmp_path):
+    path = tmp_path / "tl.json"
+    trailing = {"notes": ["x" * 100] * 50, "modified": 1, "more": {"a": ["b"] * 500}}
+    utils.writeJson(path, {**HEADER, "text": textBlocks(2000), **trailing})
+    peekMatchesFullRead(path, fast=False)
+
+
+def test_peekOtherLayout(tmp_path):
+    path = tmp_path / "tl.json"
+    utils.writeJson(path, {**HEADER, "text": textBlocks(2000), "modified": 1}, indent=2)
+    peekMatchesFullRead(path, fast=False)